@@ -1,5 +1,6 @@
 from datetime import datetime, timedelta
 from airflow import DAG
+from airflow.decorators import task, task_group
 from airflow.operators.python import PythonOperator
 from airflow.operators.bash import BashOperator
 import sys
@@ -25,41 +26,135 @@ dag = DAG(
     default_args=default_args,
     description='Pipeline ETL completo de DataOps',
     schedule_interval=timedelta(hours=6),  # Executa a cada 6 horas
-    catchup=False,
+    # Cada execução grava em partições próprias (dt=/run=): backfills e execuções
+    # concorrentes não colidem; apenas a carga no warehouse é serializada. O
+    # catchup desde start_date fica desligado (no primeiro deploy enfileiraria
+    # milhares de extrações completas); ETL_CATCHUP=true ou `airflow dags backfill`
+    catchup=os.getenv('ETL_CATCHUP', 'false').lower() == 'true',
+    max_active_runs=int(os.getenv('ETL_MAX_ACTIVE_RUNS', '4')),
     tags=['dataops', 'etl', 'pipeline'],
+    params={
+        # Ignora as marcas d'água da extração incremental e relê as tabelas inteiras
+        'full_refresh': False,
+        # Número de fatias paralelas da extração de vendas (backfills longos)
+        'sales_partitions': int(os.getenv('SALES_EXTRACT_PARTITIONS', '1')),
+        # Horas de vendas por fatia processada em paralelo (extração, transformação e carga)
+        'slice_hours': float(os.getenv('ETL_SALES_SLICE_HOURS', '24')),
+        # Janela de vendas explícita (timestamps ISO) no lugar do intervalo da execução
+        'window_start': None,
+        'window_end': None,
+    },
 )
 
+def run_partition(context):
+    """Partição da execução: data lógica, run_id e janela de vendas do contexto"""
+    from storage.data_store import RunPartition
+    params = context['params']
+    return RunPartition(
+        context['ds'],
+        context['run_id'],
+        start_date=params.get('window_start') or context['data_interval_start'].strftime('%Y-%m-%dT%H:%M:%S'),
+        end_date=params.get('window_end') or context['data_interval_end'].strftime('%Y-%m-%dT%H:%M:%S'),
+    )
+
 def extract_database_data(**context):
-    """Task para extração de dados do banco"""
+    """Task para extração das dimensões (clientes e produtos) do banco"""
     from extract.db_extractor import main as extract_db_main
-    extract_db_main()
+    extract_db_main(
+        full_refresh=context['params'].get('full_refresh') or None,
+        partition=run_partition(context),
+        tables=['customers', 'products'],
+    )
 
 def extract_api_data(**context):
     """Task para extração de dados de APIs"""
     from extract.api_extractor import main as extract_api_main
-    extract_api_main()
+    extract_api_main(partition=run_partition(context))
 
 def transform_data(**context):
-    """Task para transformação dos dados"""
+    """Task para transformação das dimensões"""
     from transform.data_transformer import main as transform_main
-    transform_main()
+    transform_main(partition=run_partition(context), datasets=['customers', 'products'])
 
 def load_data(**context):
-    """Task para carregamento no data warehouse"""
+    """Task para carregamento das dimensões no data warehouse"""
+    from load.data_loader import main as load_main
+    load_main(partition=run_partition(context), steps=['dimensions'])
+
+def load_aggregates(**context):
+    """Task de redução: consolida nos agregados os grupos tocados pelas fatias"""
     from load.data_loader import main as load_main
-    load_main()
+    load_main(partition=run_partition(context), steps=['aggregates'])
+
+@task
+def plan_sales_slices(**context):
+    """Fatias da janela de vendas da execução (uma instância do grupo mapeado por fatia)"""
+    partition = run_partition(context)
+    if os.getenv('EXTRACT_MODE', 'window') == 'incremental':
+        # Marcas d'água não se dividem por janela: uma única fatia com todo o delta
+        partition.part = 0
+        return [partition.to_dict()]
+    return [sales_slice.to_dict() for sales_slice in partition.slices(float(context['params']['slice_hours']))]
+
+@task(task_id='extract_sales')
+def extract_sales_slice(sales_slice, **context):
+    """Extrai as vendas da fatia"""
+    from extract.db_extractor import main as extract_db_main
+    from storage.data_store import RunPartition
+    extract_db_main(
+        full_refresh=context['params'].get('full_refresh') or None,
+        partitions=context['params'].get('sales_partitions'),
+        partition=RunPartition.from_dict(sales_slice),
+        tables=['sales'],
+    )
+    return sales_slice
+
+@task(task_id='transform_sales')
+def transform_sales_slice(sales_slice):
+    """Transforma as vendas da fatia (expectativas avaliadas por fatia)"""
+    from transform.data_transformer import main as transform_main
+    from storage.data_store import RunPartition
+    transform_main(partition=RunPartition.from_dict(sales_slice), datasets=['sales'])
+    return sales_slice
+
+@task(task_id='load_sales')
+def load_sales_slice(sales_slice):
+    """Carrega a fato da fatia; os agregados ficam para a redução"""
+    from load.data_loader import main as load_main
+    from storage.data_store import RunPartition
+    load_main(partition=RunPartition.from_dict(sales_slice), steps=['facts'])
+    return sales_slice
 
 def validate_pipeline(**context):
-    """Task para validação do pipeline"""
-    import pandas as pd
+    """Task para validação do pipeline
+
+    As expectativas (transform/expectations.json) já são avaliadas em cada
+    transformação (dimensões e fatias de vendas), antes da carga; aqui os
+    resultados persistidos são conferidos e os alertas são registrados no
+    log da task.
+    """
     import json
+    from storage.data_store import RunPartition, get_store
+    from transform.expectations import ExpectationSuite
+    
+    # Dimensões no diretório da execução, vendas no de cada fatia
+    sales_slices = context['ti'].xcom_pull(task_ids='plan_sales_slices') or []
+    outputs = [(run_partition(context), ['customers_data', 'products_data'], ['customers_clean', 'products_clean'])]
+    outputs += [(RunPartition.from_dict(sales_slice), ['sales_data'], ['sales_clean'])
+                for sales_slice in sales_slices]
     
     # Verificar se os arquivos foram criados
-    required_files = [
-        '/opt/airflow/data/raw/sales_data.csv',
-        '/opt/airflow/data/processed/sales_clean.csv',
-        '/opt/airflow/data/processed/data_quality_report.json'
-    ]
+    required_files = []
+    expectation_results_paths = []
+    for partition, raw_names, clean_names in outputs:
+        raw_store = get_store('raw', partition=partition)
+        processed_store = get_store('processed', partition=partition)
+        expectation_results_path = os.path.join(processed_store.base_dir, 'expectation_results.json')
+        required_files += [raw_store.path(name) for name in raw_names]
+        required_files += [processed_store.path(name) for name in clean_names]
+        required_files += [os.path.join(processed_store.base_dir, 'data_quality_report.json'),
+                           expectation_results_path]
+        expectation_results_paths.append(expectation_results_path)
     
     missing_files = []
     for file_path in required_files:
@@ -69,15 +164,29 @@ def validate_pipeline(**context):
     if missing_files:
         raise FileNotFoundError(f"Missing files: {missing_files}")
     
-    # Verificar qualidade dos dados
-    with open('/opt/airflow/data/processed/data_quality_report.json', 'r') as f:
-        quality_report = json.load(f)
+    # Verificar o resultado das expectativas
+    results = []
+    for expectation_results_path in expectation_results_paths:
+        with open(expectation_results_path, 'r') as f:
+            results += json.load(f)
+    
+    for result in results:
+        if not result['passed']:
+            print(f"Expectation failed ({result['severity']}): {result['dataset']}.{result['rule']} "
+                  f"{result['column'] or ''} observed={result['observed']}")
+    ExpectationSuite.load().enforce(results)
     
-    for report in quality_report:
-        if report['null_values'] > report['total_records'] * 0.1:  # Mais de 10% de nulos
-            raise ValueError(f"Dataset {report['dataset']} has too many null values: {report['null_values']}")
+    print(f"Pipeline validation successful! {sum(result['passed'] for result in results)}/{len(results)} "
+          f"expectations passed in {len(sales_slices)} sales slices")
+
+def cleanup_partitions(**context):
+    """Task para remoção das partições de execuções antigas (ETL_PARTITION_RETENTION_DAYS)"""
+    from storage.data_store import PARTITIONED_ZONES, cleanup_partitions as cleanup_zone
     
-    print("Pipeline validation successful!")
+    retention_days = int(os.getenv('ETL_PARTITION_RETENTION_DAYS', '7'))
+    for zone in PARTITIONED_ZONES:
+        removed = cleanup_zone(zone, retention_days)
+        print(f"Removed {len(removed)} {zone} partitions older than {retention_days} days")
 
 # Task 1: Criar diretórios necessários
 create_directories = BashOperator(
@@ -86,9 +195,9 @@ create_directories = BashOperator(
     dag=dag,
 )
 
-# Task 2: Extração de dados do banco de dados
+# Task 2: Extração das dimensões do banco de dados
 extract_db_task = PythonOperator(
-    task_id='extract_database_data',
+    task_id='extract_dimensions',
     python_callable=extract_database_data,
     dag=dag,
 )
@@ -100,37 +209,68 @@ extract_api_task = PythonOperator(
     dag=dag,
 )
 
-# Task 4: Transformação dos dados
+# Task 4: Transformação das dimensões
 transform_task = PythonOperator(
-    task_id='transform_data',
+    task_id='transform_dimensions',
     python_callable=transform_data,
     dag=dag,
 )
 
-# Task 5: Carregamento no data warehouse
+# Task 5: Carregamento das dimensões no data warehouse
 load_task = PythonOperator(
-    task_id='load_data',
+    task_id='load_dimensions',
     python_callable=load_data,
     dag=dag,
 )
 
-# Task 6: Validação do pipeline
+# Task 6: Vendas por fatia da janela (mapeamento dinâmico): extração, transformação
+# e carga de cada fatia em sequência, fatias diferentes em paralelo nos workers
+@task_group(group_id='sales_slices')
+def process_sales_slice(sales_slice):
+    transformed = transform_sales_slice(extract_sales_slice(sales_slice))
+    loaded = load_sales_slice(transformed)
+    # A integridade referencial usa as chaves das dimensões aprovadas e a carga,
+    # as chaves substitutas já no warehouse
+    transform_task >> transformed
+    load_task >> loaded
+
+with dag:
+    sales_slices = plan_sales_slices()
+    sales_task_group = process_sales_slice.expand(sales_slice=sales_slices)
+
+# Task 7: Redução dos agregados tocados pelas fatias
+aggregate_task = PythonOperator(
+    task_id='load_aggregates',
+    python_callable=load_aggregates,
+    dag=dag,
+)
+
+# Task 8: Validação do pipeline
 validate_task = PythonOperator(
     task_id='validate_pipeline',
     python_callable=validate_pipeline,
     dag=dag,
 )
 
-# Task 7: Notificação de sucesso
+# Task 9: Notificação de sucesso
 notify_success = BashOperator(
     task_id='notify_success',
     bash_command='echo "Pipeline ETL executado com sucesso em $(date)"',
     dag=dag,
 )
 
+# Task 10: Retenção das partições de execuções antigas
+cleanup_task = PythonOperator(
+    task_id='cleanup_partitions',
+    python_callable=cleanup_partitions,
+    dag=dag,
+)
+
 # Definindo dependências das tasks
-create_directories >> [extract_db_task, extract_api_task]
+create_directories >> [extract_db_task, extract_api_task, sales_slices]
 [extract_db_task, extract_api_task] >> transform_task
 transform_task >> load_task
-load_task >> validate_task
-validate_task >> notify_success
\ No newline at end of file
+sales_task_group >> aggregate_task
+load_task >> aggregate_task
+aggregate_task >> validate_task
+validate_task >> [notify_success, cleanup_task]
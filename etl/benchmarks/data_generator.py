@@ -0,0 +1,191 @@
+import pandas as pd
+import numpy as np
+import logging
+import re
+
+# Escalas nomeadas aceitas pelos benchmarks (sufixos k, m e b)
+SCALE_SUFFIXES = {'': 1, 'k': 1_000, 'm': 1_000_000, 'b': 1_000_000_000}
+
+CITIES = ['São Paulo', 'Rio de Janeiro', 'Belo Horizonte', 'Brasília', 'Salvador', 'Fortaleza',
+          'Curitiba', 'Manaus', 'Recife', 'Porto Alegre', 'Goiânia', 'Belém', 'Florianópolis',
+          'Campinas', 'Vitória', 'Natal', 'São Luís', 'Maceió', 'João Pessoa', 'Cuiabá']
+COUNTRIES = ['BR', 'AR', 'PT', 'US']
+CATEGORIES = ['Eletrônicos', 'Informática', 'Acessórios', 'Áudio', 'Casa', 'Esporte',
+              'Livros', 'Brinquedos', 'Moda', 'Beleza']
+BRANDS = ['Samsung', 'Apple', 'Dell', 'LG', 'Sony', 'Logitech', 'Corsair', 'ASUS', 'Canon',
+          'Garmin', 'JBL', 'Anker', 'Philips', 'Xiaomi', 'Lenovo', 'Multilaser', 'Positivo', 'Intelbras']
+
+
+def parse_scale(scale):
+    """Número de linhas de uma escala (ex.: ``10k``, ``1m``, ``100m`` ou ``25000``)"""
+    match = re.fullmatch(r'(\d+)([kmb]?)', str(scale).strip().lower())
+    if not match:
+        raise ValueError(f"Invalid benchmark scale: {scale}")
+    return int(match.group(1)) * SCALE_SUFFIXES[match.group(2)]
+
+
+def zipf_cdf(count, exponent, rng):
+    """Distribuição acumulada de popularidade Zipf sobre ``count`` itens em ordem aleatória
+
+    Poucos itens concentram a maior parte das ocorrências (clientes e produtos
+    mais vendidos, cidades maiores); a permutação evita que a popularidade
+    acompanhe o id.
+    """
+    weights = 1.0 / np.power(np.arange(1, count + 1, dtype=np.float64), exponent)
+    cdf = np.cumsum(rng.permutation(weights))
+    return cdf / cdf[-1]
+
+
+class SyntheticDataGenerator:
+    """Gera clientes, produtos e vendas sintéticos no schema dos datasets brutos
+
+    Os datasets seguem as colunas da extração (``customers_data``,
+    ``products_data`` e ``sales_data``) e são reprodutíveis pela ``seed``.
+    Clientes, produtos e cidades têm popularidade Zipf (``skew``), as vendas
+    se concentram nos fins de semana e no fim do ano, e uma fração
+    ``dirty_ratio`` das vendas viola as regras de limpeza (quantidade ou preço
+    não positivos, total nulo). As vendas são geradas em blocos: qualquer
+    escala cabe em memória limitada por ``chunk_rows``.
+    """
+
+    def __init__(self, seed=42, skew=0.9, dirty_ratio=0.01, start_date='2024-01-01', days=365):
+        self.seed = seed
+        self.skew = skew
+        self.dirty_ratio = dirty_ratio
+        self.start_date = pd.Timestamp(start_date)
+        self.days = days
+        self.logger = logging.getLogger(__name__)
+
+    def _rng(self, *stream):
+        # Um gerador por dataset/bloco: o conteúdo não depende da ordem de geração
+        return np.random.default_rng([self.seed, *stream])
+
+    @staticmethod
+    def dimension_sizes(sales_rows):
+        """Clientes e produtos proporcionais ao volume de vendas"""
+        customers = max(100, sales_rows // 20)
+        products = max(50, min(sales_rows // 200, 200_000))
+        return customers, products
+
+    def customers(self, count):
+        rng = self._rng(1)
+        ids = np.arange(1, count + 1)
+        city = np.searchsorted(zipf_cdf(len(CITIES), self.skew, rng), rng.random(count))
+        registration = self.start_date - pd.to_timedelta(rng.integers(0, 5 * 365, count), unit='D')
+        # Última compra recente para a maioria, antiga para uma cauda de inativos
+        recency = np.minimum(rng.exponential(60, count), 3 * 365).astype(np.int64)
+        last_purchase = self.start_date + pd.Timedelta(days=self.days) - pd.to_timedelta(recency, unit='D')
+        email = np.char.add(np.char.add('customer', ids.astype(str)), '@email.com').astype(object)
+        invalid = rng.random(count) < 0.02
+        email[invalid] = np.char.replace(email[invalid].astype(str), '@', ' at ')
+
+        return pd.DataFrame({
+            'customer_id': ids,
+            'customer_name': np.char.add('Cliente ', ids.astype(str)).astype(object),
+            'email': email,
+            'phone': rng.integers(11_900_000_000, 99_999_999_999, count).astype(str).astype(object),
+            'address': np.char.add('Rua ', rng.integers(1, 5_000, count).astype(str)).astype(object),
+            'city': np.asarray(CITIES, dtype=object)[city],
+            'country': np.asarray(COUNTRIES, dtype=object)[
+                np.searchsorted(zipf_cdf(len(COUNTRIES), 3.0, rng), rng.random(count))],
+            'registration_date': registration,
+            'last_purchase_date': last_purchase,
+            'total_purchases': rng.poisson(8, count),
+            'customer_status': 'active',
+        })
+
+    def products(self, count):
+        rng = self._rng(2)
+        ids = np.arange(1, count + 1)
+        # Preços log-normais (muitos itens baratos, poucos caros) e margens de 5% a 60%
+        unit_price = np.round(np.exp(rng.normal(4.5, 1.2, count)), 2) + 1
+        cost_price = np.round(unit_price * rng.uniform(0.4, 0.95, count), 2)
+        created = self.start_date - pd.to_timedelta(rng.integers(30, 3 * 365, count), unit='D')
+
+        return pd.DataFrame({
+            'product_id': ids,
+            'product_name': np.char.add('Produto ', ids.astype(str)).astype(object),
+            'category': np.asarray(CATEGORIES, dtype=object)[
+                np.searchsorted(zipf_cdf(len(CATEGORIES), self.skew, rng), rng.random(count))],
+            'brand': np.asarray(BRANDS, dtype=object)[rng.integers(0, len(BRANDS), count)],
+            'unit_price': unit_price,
+            'cost_price': cost_price,
+            'stock_quantity': rng.integers(0, 1_000, count),
+            'supplier_id': rng.integers(1, 200, count),
+            'product_status': 'active',
+            'created_date': created,
+            'last_updated': created + pd.to_timedelta(rng.integers(0, 30, count), unit='D'),
+        })
+
+    def _day_cdf(self):
+        # Fins de semana com 40% mais vendas e rampa de 50% até o fim do período
+        days = pd.date_range(self.start_date, periods=self.days, freq='D')
+        weights = np.where(days.dayofweek >= 5, 1.4, 1.0) * np.linspace(1.0, 1.5, self.days)
+        cdf = np.cumsum(weights)
+        return cdf / cdf[-1]
+
+    def iter_sales(self, rows, customers, products, chunk_rows=1_000_000):
+        """Vendas em blocos de até ``chunk_rows`` linhas, com as colunas de clientes e produtos"""
+        rng = self._rng(3)
+        customer_cdf = zipf_cdf(len(customers), self.skew, rng)
+        product_cdf = zipf_cdf(len(products), self.skew, rng)
+        day_cdf = self._day_cdf()
+        customer_columns = {column: customers[column].to_numpy()
+                            for column in ['customer_id', 'customer_name', 'email', 'city', 'country']}
+        product_columns = {column: products[column].to_numpy()
+                           for column in ['product_id', 'product_name', 'category', 'brand', 'unit_price']}
+
+        for index, start in enumerate(range(0, rows, chunk_rows)):
+            rng = self._rng(4, index)
+            size = min(chunk_rows, rows - start)
+            customer = np.searchsorted(customer_cdf, rng.random(size))
+            product = np.searchsorted(product_cdf, rng.random(size))
+            unit_price = product_columns['unit_price'][product]
+            quantity = np.minimum(rng.geometric(0.5, size), 20)
+            # 15% das vendas com desconto de 5% a 20% sobre o total
+            discount = np.where(rng.random(size) < 0.15, rng.uniform(0.8, 0.95, size), 1.0)
+            total_amount = np.round(quantity * unit_price * discount, 2)
+            day = np.searchsorted(day_cdf, rng.random(size))
+            sale_date = (self.start_date + pd.to_timedelta(day, unit='D')
+                         + pd.to_timedelta(rng.integers(0, 86_400, size), unit='s'))
+
+            chunk = pd.DataFrame({
+                'sale_id': np.arange(start + 1, start + size + 1),
+                'customer_id': customer_columns['customer_id'][customer],
+                'product_id': product_columns['product_id'][product],
+                'quantity': quantity,
+                'unit_price': unit_price,
+                'total_amount': total_amount,
+                'sale_date': sale_date,
+                'customer_name': customer_columns['customer_name'][customer],
+                'email': customer_columns['email'][customer],
+                'city': customer_columns['city'][customer],
+                'country': customer_columns['country'][customer],
+                'product_name': product_columns['product_name'][product],
+                'category': product_columns['category'][product],
+                'brand': product_columns['brand'][product],
+            })
+
+            # Violações das regras de limpeza, divididas igualmente entre os tipos
+            dirty = np.flatnonzero(rng.random(size) < self.dirty_ratio)
+            kind = rng.integers(0, 3, len(dirty))
+            chunk.loc[dirty[kind == 0], 'quantity'] = -chunk['quantity'].to_numpy()[dirty[kind == 0]]
+            chunk.loc[dirty[kind == 1], 'unit_price'] = 0.0
+            chunk.loc[dirty[kind == 2], 'total_amount'] = np.nan
+            yield chunk
+
+    def write(self, store, sales_rows, chunk_rows=1_000_000):
+        """Grava os três datasets brutos no armazenamento e retorna o número de linhas de cada"""
+        customer_count, product_count = self.dimension_sizes(sales_rows)
+        customers = self.customers(customer_count)
+        products = self.products(product_count)
+        store.write(customers, 'customers_data')
+        store.write(products, 'products_data')
+
+        with store.open_writer('sales_data') as writer:
+            for chunk in self.iter_sales(sales_rows, customers, products, chunk_rows):
+                writer.write(chunk)
+
+        self.logger.info(f"Generated {writer.rows} sales, {len(customers)} customers and "
+                         f"{len(products)} products (seed {self.seed}) in {store.base_dir}")
+        return {'sales_data': writer.rows, 'customers_data': len(customers), 'products_data': len(products)}
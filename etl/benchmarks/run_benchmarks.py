@@ -0,0 +1,416 @@
+import pandas as pd
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+from benchmarks.data_generator import SyntheticDataGenerator, parse_scale
+from metrics.stage_metrics import peak_rss_bytes
+from storage.data_store import DEFAULT_DATA_DIR, ParquetStore
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# Benchmarks que precisam de um PostgreSQL dedicado (BENCHMARK_DB_CONNECTION)
+LOAD_BENCHMARKS = ('load_dimensions', 'load_facts', 'load_facts_upsert', 'load_aggregates')
+
+
+class BenchmarkRegression(RuntimeError):
+    """Vazão ou pico de memória piores que a linha de base além da tolerância"""
+
+
+class BenchmarkTimer:
+    """Acumula o tempo e as linhas apenas das chamadas medidas
+
+    Leitura dos blocos e preparação (limpeza antes do resumo, carga das
+    dimensões antes da fato, ...) ficam fora da medição.
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.rows = 0
+
+    @contextmanager
+    def measure(self, rows):
+        started = time.perf_counter()
+        yield
+        self.seconds += time.perf_counter() - started
+        self.rows += rows
+
+
+def _transformer():
+    from transform.data_transformer import DataTransformer
+    return DataTransformer()
+
+
+def _raw_chunks(dataset_dir, chunk_rows):
+    from transform.dtype_planner import DtypePlanner
+
+    planner = DtypePlanner()
+    for chunk in ParquetStore(os.path.join(dataset_dir, 'raw')).iter_chunks('sales_data', chunk_rows):
+        yield planner.apply(chunk, 'sales_data')
+
+
+def _clean_chunks(transformer, dataset_dir, chunk_rows):
+    for chunk in _raw_chunks(dataset_dir, chunk_rows):
+        yield transformer.clean_sales_data(chunk)
+
+
+def bench_clean_sales_data(dataset_dir, chunk_rows, connection_string=None):
+    """DataTransformer.clean_sales_data, bloco a bloco"""
+    transformer = _transformer()
+    timer = BenchmarkTimer()
+    for chunk in _raw_chunks(dataset_dir, chunk_rows):
+        with timer.measure(len(chunk)):
+            transformer.clean_sales_data(chunk)
+    return timer
+
+
+def bench_create_sales_summary(dataset_dir, chunk_rows, connection_string=None):
+    """create_sales_summary; acima de um bloco, parciais combinados como em transform_chunks"""
+    transformer = _transformer()
+    timer = BenchmarkTimer()
+    single_chunk = ParquetStore(os.path.join(dataset_dir, 'raw')).row_count('sales_data') <= chunk_rows
+    summary = None
+    for chunk in _clean_chunks(transformer, dataset_dir, chunk_rows):
+        with timer.measure(len(chunk)):
+            if single_chunk:
+                transformer.create_sales_summary(chunk)
+                continue
+            partials = [transformer.partial_sales_summary(chunk)]
+            summary = transformer.merge_sales_summaries([summary] + partials if summary else partials)
+    if summary:
+        with timer.measure(0):
+            transformer.finalize_sales_summary(summary)
+    return timer
+
+
+def bench_data_quality(dataset_dir, chunk_rows, connection_string=None):
+    """Validação de qualidade: perfil combinável das vendas, relatório e expectativas"""
+    transformer = _transformer()
+    timer = BenchmarkTimer()
+    # Perfis das dimensões (fora da medição) para a integridade referencial das vendas
+    raw_store = ParquetStore(os.path.join(dataset_dir, 'raw'))
+    profiles = {dataset_name: transformer.profile(raw_store.read(raw_name), dataset_name)
+                for dataset_name, (raw_name, _, _) in transformer.DATASETS.items() if dataset_name != 'sales'}
+    profile = None
+    for chunk in _clean_chunks(transformer, dataset_dir, chunk_rows):
+        with timer.measure(len(chunk)):
+            profile = transformer.profiler.merge([profile, transformer.profile(chunk, 'sales')])
+    with timer.measure(0):
+        report = transformer.profiler.report(profile, 'sales')
+        transformer.expectations.evaluate({'sales': report}, {**profiles, 'sales': profile})
+    return timer
+
+
+def _loader(dataset_dir, connection_string, load_mode='full'):
+    from load.data_loader import DataLoader
+    from metrics.stage_metrics import MetricsRecorder
+
+    loader = DataLoader(connection_string, store=ParquetStore(os.path.join(dataset_dir, 'processed')),
+                        load_method='copy', load_mode=load_mode, scd_type=2, agg_mode='incremental',
+                        metrics=MetricsRecorder())
+    loader.create_warehouse_tables()
+    return loader
+
+
+def _fact_rows(loader):
+    return loader.store.row_count('sales_clean')
+
+
+def bench_load_dimensions(dataset_dir, chunk_rows, connection_string=None):
+    """Carga completa das dimensões (TRUNCATE + COPY)"""
+    loader = _loader(dataset_dir, connection_string)
+    timer = BenchmarkTimer()
+    rows = loader.store.row_count('customers_clean') + loader.store.row_count('products_clean')
+    with timer.measure(rows):
+        loader.load_dimension_tables()
+    return timer
+
+
+def bench_load_facts(dataset_dir, chunk_rows, connection_string=None):
+    """Carga completa da fato (resolução das chaves + COPY)"""
+    loader = _loader(dataset_dir, connection_string)
+    loader.load_dimension_tables()
+    loader.generate_time_dimension()
+    timer = BenchmarkTimer()
+    with timer.measure(_fact_rows(loader)):
+        loader.load_fact_table()
+    return timer
+
+
+def bench_load_facts_upsert(dataset_dir, chunk_rows, connection_string=None):
+    """Recarga incremental do mesmo lote: upsert pela chave natural e delta dos agregados"""
+    loader = _loader(dataset_dir, connection_string)
+    loader.load_dimension_tables()
+    loader.generate_time_dimension()
+    loader.load_fact_table()
+    loader.load_aggregated_tables()
+    loader.load_mode = 'upsert'
+    timer = BenchmarkTimer()
+    with timer.measure(_fact_rows(loader)):
+        loader.load_fact_table()
+    return timer
+
+
+def bench_load_aggregates(dataset_dir, chunk_rows, connection_string=None):
+    """Reconstrução dos agregados a partir da fato (linhas = vendas agregadas)"""
+    loader = _loader(dataset_dir, connection_string)
+    loader.load_dimension_tables()
+    loader.generate_time_dimension()
+    loader.load_fact_table()
+    timer = BenchmarkTimer()
+    with timer.measure(_fact_rows(loader)):
+        loader.load_aggregated_tables()
+    return timer
+
+
+BENCHMARKS = {
+    'clean_sales_data': bench_clean_sales_data,
+    'create_sales_summary': bench_create_sales_summary,
+    'data_quality': bench_data_quality,
+    'load_dimensions': bench_load_dimensions,
+    'load_facts': bench_load_facts,
+    'load_facts_upsert': bench_load_facts_upsert,
+    'load_aggregates': bench_load_aggregates,
+}
+
+
+def _run_benchmark(name, dataset_dir, chunk_rows, connection_string):
+    """Executa um benchmark no processo atual (um processo novo por benchmark)"""
+    # Sem os logs INFO por bloco das etapas
+    logging.basicConfig(level=logging.WARNING)
+    startup_rss = peak_rss_bytes()
+    timer = BENCHMARKS[name](dataset_dir, chunk_rows, connection_string)
+    return {
+        'rows': timer.rows,
+        'seconds': round(timer.seconds, 4),
+        'rows_per_second': round(timer.rows / timer.seconds, 1) if timer.seconds else None,
+        'peak_rss_bytes': peak_rss_bytes(),
+        'startup_rss_bytes': startup_rss,
+    }
+
+
+class BenchmarkSuite:
+    """Benchmarks das etapas do ETL sobre dados sintéticos reprodutíveis
+
+    Para cada escala (número de vendas), os datasets brutos são gerados uma
+    vez por SyntheticDataGenerator em ``<data_dir>/<escala>-seed<seed>/raw``
+    e reaproveitados enquanto os parâmetros forem os mesmos; os benchmarks de
+    carga usam os datasets processados pela transformação por blocos. Cada
+    benchmark roda em um processo novo: o pico de memória (RSS) medido é só
+    dele. A vazão considera apenas o tempo das chamadas medidas.
+    """
+
+    def __init__(self, data_dir, scales, benchmarks=None, chunk_rows=1_000_000, seed=42, skew=0.9,
+                 connection_string=None, load_max_rows=10_000_000, repeat=3):
+        self.data_dir = data_dir
+        self.scales = scales
+        self.benchmarks = list(benchmarks or BENCHMARKS)
+        self.chunk_rows = chunk_rows
+        self.generator = SyntheticDataGenerator(seed=seed, skew=skew)
+        self.connection_string = connection_string
+        # A carga lê a fato inteira em memória: escalas maiores ficam de fora
+        self.load_max_rows = load_max_rows
+        # Repetições por benchmark: vale a melhor vazão e o maior pico de memória
+        self.repeat = max(1, repeat)
+        self.logger = logging.getLogger(__name__)
+
+        unknown = set(self.benchmarks) - set(BENCHMARKS)
+        if unknown:
+            raise ValueError(f"Unknown benchmarks: {sorted(unknown)}")
+
+    def dataset_dir(self, scale):
+        return os.path.join(self.data_dir, f"{scale}-seed{self.generator.seed}")
+
+    def prepare(self, scale):
+        """Gera os datasets brutos da escala (se ainda não existem com os mesmos parâmetros)"""
+        dataset_dir = self.dataset_dir(scale)
+        marker_path = os.path.join(dataset_dir, 'dataset.json')
+        params = {'rows': parse_scale(scale), 'seed': self.generator.seed, 'skew': self.generator.skew,
+                  'dirty_ratio': self.generator.dirty_ratio}
+        if os.path.exists(marker_path):
+            with open(marker_path) as f:
+                if json.load(f)['params'] == params:
+                    return dataset_dir
+
+        # Datasets processados de uma geração anterior não valem para a nova
+        shutil.rmtree(os.path.join(dataset_dir, 'processed'), ignore_errors=True)
+        started = time.perf_counter()
+        counts = self.generator.write(ParquetStore(os.path.join(dataset_dir, 'raw')), params['rows'],
+                                      self.chunk_rows)
+        with open(marker_path, 'w') as f:
+            json.dump({'params': params, 'counts': counts}, f, indent=2)
+        self.logger.info(f"Benchmark dataset {scale} generated in {time.perf_counter() - started:.1f}s")
+        return dataset_dir
+
+    def prepare_processed(self, dataset_dir):
+        """Datasets processados (entrada da carga), pela transformação por blocos"""
+        from transform.dtype_planner import DtypePlanner
+
+        processed_store = ParquetStore(os.path.join(dataset_dir, 'processed'))
+        if processed_store.exists('sales_clean'):
+            return
+        _transformer().transform_chunked(ParquetStore(os.path.join(dataset_dir, 'raw')), processed_store,
+                                         DtypePlanner(), self.chunk_rows)
+
+    def run_isolated(self, name, dataset_dir):
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            return executor.submit(_run_benchmark, name, dataset_dir, self.chunk_rows,
+                                   self.connection_string).result()
+
+    def run(self):
+        results = []
+        for scale in self.scales:
+            rows = parse_scale(scale)
+            dataset_dir = self.prepare(scale)
+            for name in self.benchmarks:
+                if name in LOAD_BENCHMARKS:
+                    if not self.connection_string:
+                        self.logger.info(f"Skipping {name}: BENCHMARK_DB_CONNECTION not set")
+                        continue
+                    if rows > self.load_max_rows:
+                        self.logger.info(f"Skipping {name}@{scale}: above BENCHMARK_LOAD_MAX_ROWS")
+                        continue
+                    self.prepare_processed(dataset_dir)
+
+                self.logger.info(f"Running {name}@{scale}")
+                runs = [self.run_isolated(name, dataset_dir) for _ in range(self.repeat)]
+                result = {'benchmark': name, 'scale': scale,
+                          **max(runs, key=lambda run: run['rows_per_second'] or 0),
+                          'peak_rss_bytes': max(run['peak_rss_bytes'] or 0 for run in runs) or None,
+                          'repeat': self.repeat}
+                self.logger.info(f"{name}@{scale}: {result['rows']} rows in {result['seconds']}s "
+                                 f"({result['rows_per_second']} rows/s), peak RSS {result['peak_rss_bytes']}")
+                results.append(result)
+        return results
+
+    @staticmethod
+    def environment():
+        return {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpus': os.cpu_count(),
+        }
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, results, baseline=None):
+    """Grava os resultados como linha de base (mantendo as entradas não executadas agora)"""
+    baseline = baseline or {'results': {}}
+    baseline['created_at'] = datetime.now().isoformat()
+    baseline['environment'] = BenchmarkSuite.environment()
+    for result in results:
+        baseline['results'][f"{result['benchmark']}@{result['scale']}"] = {
+            'rows_per_second': result['rows_per_second'],
+            'peak_rss_bytes': result['peak_rss_bytes'],
+        }
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def compare(results, baseline, tolerance=0.2, memory_tolerance=0.2):
+    """Compara com a linha de base: vazão menor ou pico de memória maior que a tolerância"""
+    comparisons = []
+    for result in results:
+        base = (baseline or {}).get('results', {}).get(f"{result['benchmark']}@{result['scale']}")
+        comparison = {'benchmark': result['benchmark'], 'scale': result['scale'],
+                      'rows_per_second': result['rows_per_second'], 'peak_rss_mb': None,
+                      'throughput_ratio': None, 'memory_ratio': None, 'regression': False}
+        if result['peak_rss_bytes']:
+            comparison['peak_rss_mb'] = round(result['peak_rss_bytes'] / 1024 ** 2, 1)
+        if base:
+            if base.get('rows_per_second') and result['rows_per_second']:
+                comparison['throughput_ratio'] = round(result['rows_per_second'] / base['rows_per_second'], 3)
+            if base.get('peak_rss_bytes') and result['peak_rss_bytes']:
+                comparison['memory_ratio'] = round(result['peak_rss_bytes'] / base['peak_rss_bytes'], 3)
+            comparison['regression'] = bool(
+                (comparison['throughput_ratio'] is not None and comparison['throughput_ratio'] < 1 - tolerance)
+                or (comparison['memory_ratio'] is not None and comparison['memory_ratio'] > 1 + memory_tolerance)
+            )
+        comparisons.append(comparison)
+    return comparisons
+
+
+def main():
+    """Executa os benchmarks configurados pelo ambiente
+
+    - BENCHMARK_SCALES: escalas separadas por vírgula (padrão ``10k,100k``; até ``100m``)
+    - BENCHMARK_NAMES: benchmarks a executar (padrão: todos de BENCHMARKS)
+    - BENCHMARK_REPEAT: execuções de cada benchmark (padrão 3, vale a melhor)
+    - BENCHMARK_DB_CONNECTION: PostgreSQL dedicado aos benchmarks de carga
+      (as tabelas do warehouse são truncadas); sem ele, a carga fica de fora
+    - BENCHMARK_BASELINE: linha de base (padrão: benchmarks/baseline.json);
+      BENCHMARK_UPDATE_BASELINE=true grava os resultados como nova linha de base.
+      Nenhuma linha de base acompanha o repositório (os números dependem da
+      máquina): a primeira execução com ``make benchmark-baseline`` na máquina
+      de referência a cria; até lá não há detecção de regressões, a menos que
+      BENCHMARK_REQUIRE_BASELINE=true transforme a ausência em erro
+    - BENCHMARK_TOLERANCE / BENCHMARK_MEMORY_TOLERANCE: perda de vazão e
+      aumento de memória aceitos (padrão 0.2); acima deles, BenchmarkRegression
+    """
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+    data_dir = os.getenv('BENCHMARK_DATA_DIR',
+                         os.path.join(os.getenv('ETL_DATA_DIR', DEFAULT_DATA_DIR), 'benchmarks'))
+    names = os.getenv('BENCHMARK_NAMES')
+    suite = BenchmarkSuite(
+        data_dir,
+        scales=[scale.strip() for scale in os.getenv('BENCHMARK_SCALES', '10k,100k').split(',') if scale.strip()],
+        benchmarks=[name.strip() for name in names.split(',')] if names else None,
+        chunk_rows=int(os.getenv('BENCHMARK_CHUNK_ROWS', '1000000')),
+        seed=int(os.getenv('BENCHMARK_SEED', '42')),
+        skew=float(os.getenv('BENCHMARK_SKEW', '0.9')),
+        connection_string=os.getenv('BENCHMARK_DB_CONNECTION'),
+        load_max_rows=int(os.getenv('BENCHMARK_LOAD_MAX_ROWS', '10000000')),
+        repeat=int(os.getenv('BENCHMARK_REPEAT', '3'))
+    )
+    results = suite.run()
+
+    # Resultados da execução, com o ambiente em que foram medidos
+    os.makedirs(data_dir, exist_ok=True)
+    results_path = os.path.join(data_dir, f"results_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(results_path, 'w') as f:
+        json.dump({'environment': suite.environment(), 'results': results}, f, indent=2)
+
+    baseline_path = os.getenv('BENCHMARK_BASELINE', DEFAULT_BASELINE_PATH)
+    baseline = load_baseline(baseline_path)
+    comparisons = compare(results, baseline,
+                          tolerance=float(os.getenv('BENCHMARK_TOLERANCE', '0.2')),
+                          memory_tolerance=float(os.getenv('BENCHMARK_MEMORY_TOLERANCE', '0.2')))
+    print(pd.DataFrame(comparisons).to_string(index=False))
+    logger.info(f"Benchmark results written to {results_path}")
+
+    if os.getenv('BENCHMARK_UPDATE_BASELINE', 'false').lower() == 'true':
+        save_baseline(baseline_path, results, baseline)
+        logger.info(f"Benchmark baseline updated: {baseline_path}")
+        return
+    if baseline is None:
+        message = (f"No benchmark baseline at {baseline_path}: regressions are not checked "
+                   f"(run `make benchmark-baseline` on the reference machine to create it)")
+        if os.getenv('BENCHMARK_REQUIRE_BASELINE', 'false').lower() == 'true':
+            raise FileNotFoundError(message)
+        logger.warning(message)
+        return
+
+    regressions = [comparison for comparison in comparisons if comparison['regression']]
+    if regressions:
+        summary = ', '.join(f"{comparison['benchmark']}@{comparison['scale']}" for comparison in regressions)
+        raise BenchmarkRegression(f"{len(regressions)} benchmarks regressed against the baseline: {summary}")
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,118 @@
-import requests
 import pandas as pd
+import asyncio
 import json
 import logging
 from datetime import datetime
 import os
 import time
 
+from extract.http_cache import HttpResponseCache
+from extract.http_client import AsyncHttpClient
+from extract.json_stream import RecordSchema
+from metrics.stage_metrics import get_metrics_recorder
+from storage.data_store import DEFAULT_DATA_DIR, RunPartition, get_store
+
 class APIExtractor:
-    def __init__(self, base_url=None, api_key=None):
-        self.base_url = base_url or "https://jsonplaceholder.typicode.com"
+    # Schemas declarados: objetos aninhados (address, company) viram colunas tipadas
+    USERS_SCHEMA = RecordSchema({
+        'id': ('id', 'Int64'),
+        'name': ('name', 'string'),
+        'username': ('username', 'string'),
+        'email': ('email', 'string'),
+        'phone': ('phone', 'string'),
+        'website': ('website', 'string'),
+        'address_street': ('address.street', 'string'),
+        'address_suite': ('address.suite', 'string'),
+        'address_city': ('address.city', 'string'),
+        'address_zipcode': ('address.zipcode', 'string'),
+        'address_lat': ('address.geo.lat', 'float64'),
+        'address_lng': ('address.geo.lng', 'float64'),
+        'company_name': ('company.name', 'string'),
+        'company_catch_phrase': ('company.catchPhrase', 'string'),
+        'company_bs': ('company.bs', 'string'),
+    })
+    POSTS_SCHEMA = RecordSchema({
+        'userId': ('userId', 'Int64'),
+        'id': ('id', 'Int64'),
+        'title': ('title', 'string'),
+        'body': ('body', 'string'),
+    })
+    
+    # Endpoints extraídos: nome do dataset -> caminho, tamanho de página
+    # (None = endpoint sem paginação) e schema
+    ENDPOINTS = {
+        'users': {'path': '/users', 'page_size': None, 'schema': USERS_SCHEMA},
+        'posts': {'path': '/posts', 'page_size': 50, 'schema': POSTS_SCHEMA},
+    }
+    
+    def __init__(self, base_url=None, api_key=None, endpoints=None, cache=None):
+        self.base_url = base_url or os.getenv('API_BASE_URL', "https://jsonplaceholder.typicode.com")
         self.api_key = api_key
-        self.session = requests.Session()
+        self.endpoints = endpoints or self.ENDPOINTS
+        self.headers = {}
         if api_key:
-            self.session.headers.update({'Authorization': f'Bearer {api_key}'})
+            self.headers['Authorization'] = f'Bearer {api_key}'
+        # Concorrência, ritmo por host e novas tentativas das requisições
+        self.max_concurrency = int(os.getenv('API_MAX_CONCURRENCY', '8'))
+        self.rate_limit = float(os.getenv('API_RATE_LIMIT', '10'))
+        self.max_retries = int(os.getenv('API_MAX_RETRIES', '3'))
+        self.timeout = float(os.getenv('API_TIMEOUT', '30'))
+        self.batch_size = int(os.getenv('API_STREAM_BATCH_ROWS', '10000'))
+        # Cache de respostas em disco (opcional), revalidado com ETag/Last-Modified
+        self.cache = cache
+    
+    def _client(self):
+        return AsyncHttpClient(headers=self.headers, max_concurrency=self.max_concurrency,
+                               rate_limit=self.rate_limit, max_retries=self.max_retries,
+                               timeout=self.timeout, cache=self.cache, batch_size=self.batch_size)
+    
+    async def _fetch_endpoint(self, client, name, spec):
+        """Baixa um endpoint página a página, interpretando cada página incrementalmente"""
+        started = time.monotonic()
+        frames = []
+        async for page in client.iter_pages(f"{self.base_url}{spec['path']}",
+                                            params=spec.get('params'),
+                                            page_size=spec.get('page_size'),
+                                            schema=spec.get('schema'),
+                                            ndjson=spec.get('ndjson')):
+            frames.append(page)
+        
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        logging.info(f"Fetched {len(df)} {name} records in {time.monotonic() - started:.2f}s")
+        return df
+    
+    async def _extract_endpoints(self, endpoints):
+        async with self._client() as client:
+            frames = await asyncio.gather(*(
+                self._fetch_endpoint(client, name, spec) for name, spec in endpoints.items()
+            ))
+        return dict(zip(endpoints, frames))
+    
+    def extract_endpoints(self, endpoints=None):
+        """Extrai os endpoints configurados concorrentemente
+
+        Retorna um dicionário nome -> DataFrame, com o timestamp de extração.
+        """
+        endpoints = endpoints or self.endpoints
+        started = time.monotonic()
+        frames = asyncio.run(self._extract_endpoints(endpoints))
+        if self.cache:
+            self.cache.log_stats()
+        
+        extraction_time = datetime.now().isoformat()
+        for df in frames.values():
+            df['extraction_timestamp'] = extraction_time
+        
+        logging.info(f"Extracted {len(frames)} endpoints in {time.monotonic() - started:.2f}s")
+        return frames
     
     def extract_external_data(self):
         """Extrai dados externos de APIs simuladas"""
         try:
-            # Simular dados de usuários externos
-            users_response = self.session.get(f"{self.base_url}/users")
-            users_data = users_response.json()
-            
-            # Simular dados de posts/atividades
-            posts_response = self.session.get(f"{self.base_url}/posts")
-            posts_data = posts_response.json()
-            
-            # Converter para DataFrames
-            users_df = pd.DataFrame(users_data)
-            posts_df = pd.DataFrame(posts_data)
-            
-            # Adicionar timestamp de extração
-            extraction_time = datetime.now().isoformat()
-            users_df['extraction_timestamp'] = extraction_time
-            posts_df['extraction_timestamp'] = extraction_time
+            # Usuários e posts/atividades são baixados em paralelo
+            frames = self.extract_endpoints()
+            users_df = frames['users']
+            posts_df = frames['posts']
             
             logging.info(f"Extracted {len(users_df)} users and {len(posts_df)} posts from API")
             
@@ -109,23 +189,38 @@ class APIExtractor:
         
         return economic_df
 
-def main():
+def main(partition=None):
     # Configuração do logging
     logging.basicConfig(level=logging.INFO)
     
-    extractor = APIExtractor()
+    # Datasets no diretório da execução (RunPartition, padrão: ETL_LOGICAL_DATE)
+    partition = partition or RunPartition.from_env()
+    store = get_store('raw', partition=partition)
+    
+    # Cache de respostas HTTP (API_CACHE=false desativa)
+    cache = None
+    if os.getenv('API_CACHE', 'true').lower() == 'true':
+        cache = HttpResponseCache(
+            os.getenv('API_CACHE_DIR', os.path.join(os.getenv('ETL_DATA_DIR', DEFAULT_DATA_DIR), 'http_cache')),
+            ttl=float(os.getenv('API_CACHE_TTL', '0')),
+            max_bytes=int(os.getenv('API_CACHE_MAX_BYTES', str(100 * 1024 * 1024)))
+        )
+    
+    extractor = APIExtractor(cache=cache)
+    metrics = get_metrics_recorder(partition)
     
     try:
-        # Extrair dados de APIs
-        users_df, posts_df = extractor.extract_external_data()
-        weather_df = extractor.extract_weather_data()
-        economic_df = extractor.extract_economic_indicators()
-        
-        # Salvar dados extraídos
-        users_df.to_csv('/opt/airflow/data/raw/external_users.csv', index=False)
-        posts_df.to_csv('/opt/airflow/data/raw/external_posts.csv', index=False)
-        weather_df.to_csv('/opt/airflow/data/raw/weather_data.csv', index=False)
-        economic_df.to_csv('/opt/airflow/data/raw/economic_indicators.csv', index=False)
+        with metrics.stage('extract', 'api') as stage:
+            # Extrair dados de APIs
+            users_df, posts_df = extractor.extract_external_data()
+            weather_df = extractor.extract_weather_data()
+            economic_df = extractor.extract_economic_indicators()
+            
+            # Salvar dados extraídos
+            for df, name in [(users_df, 'external_users'), (posts_df, 'external_posts'),
+                             (weather_df, 'weather_data'), (economic_df, 'economic_indicators')]:
+                store.write(df, name)
+                stage.add_output(rows=len(df), bytes_written=store.size(name))
         
         logging.info("API data extraction completed successfully")
         
@@ -0,0 +1,142 @@
+import pandas as pd
+import hashlib
+import json
+import logging
+import os
+import time
+
+
+class HttpResponseCache:
+    """Cache em disco das respostas HTTP, já convertidas em DataFrame
+
+    Cada entrada (chave = URL + parâmetros) guarda o DataFrame da resposta em
+    Parquet e, ao lado, os metadados de validação (ETag, Last-Modified, hora da
+    busca e do último acesso). Dentro do TTL a entrada é usada sem requisição;
+    depois dele a requisição é condicional (If-None-Match / If-Modified-Since) e
+    um 304 reaproveita o DataFrame sem baixar nem interpretar o corpo. O tamanho
+    total é limitado, removendo as entradas menos usadas recentemente (LRU).
+    """
+
+    def __init__(self, cache_dir, ttl=0, max_bytes=100 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _key(self, url, params):
+        raw = json.dumps([url, sorted((params or {}).items())], default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.json", f"{base}.parquet"
+
+    def _write_meta(self, meta):
+        # Arquivo temporário + os.replace: execuções concorrentes nunca leem JSON parcial
+        meta_path, _ = self._paths(meta['key'])
+        temp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temp_path, meta_path)
+
+    def lookup(self, url, params=None):
+        """Metadados da entrada em cache (ou None)"""
+        meta_path, frame_path = self._paths(self._key(url, params))
+        if not (os.path.exists(meta_path) and os.path.exists(frame_path)):
+            return None
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            # Removida por outra execução (limite de tamanho) desde a verificação
+            return None
+
+    def is_fresh(self, meta):
+        return self.ttl > 0 and time.time() - meta['fetched_at'] < self.ttl
+
+    def conditional_headers(self, meta):
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def load(self, meta, revalidated=False):
+        """Lê o DataFrame de uma entrada (hit), renovando-a se foi revalidada com 304
+
+        Retorna None se a entrada foi removida nesse meio tempo.
+        """
+        frame_path = self._paths(meta['key'])[1]
+        try:
+            df = pd.read_parquet(frame_path)
+        except FileNotFoundError:
+            return None
+        if revalidated:
+            self.revalidated += 1
+            meta['fetched_at'] = time.time()
+        else:
+            self.hits += 1
+        meta['accessed_at'] = time.time()
+        self._write_meta(meta)
+        return df
+
+    def store(self, url, params, df, response_headers):
+        """Grava a resposta (miss) e aplica o limite de tamanho do cache"""
+        self.misses += 1
+        key = self._key(url, params)
+        _, frame_path = self._paths(key)
+        temp_path = f"{frame_path}.{os.getpid()}.tmp"
+        df.to_parquet(temp_path, index=False)
+        os.replace(temp_path, frame_path)
+
+        now = time.time()
+        self._write_meta({
+            'key': key,
+            'url': url,
+            'params': params,
+            'etag': response_headers.get('ETag'),
+            'last_modified': response_headers.get('Last-Modified'),
+            'fetched_at': now,
+            'accessed_at': now,
+            'size': os.path.getsize(frame_path)
+        })
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith('.json'):
+                try:
+                    with open(os.path.join(self.cache_dir, file_name)) as f:
+                        entries.append(json.load(f))
+                except FileNotFoundError:
+                    continue
+
+        total = sum(entry['size'] for entry in entries)
+        for entry in sorted(entries, key=lambda entry: entry['accessed_at']):
+            if total <= self.max_bytes:
+                break
+            for path in self._paths(entry['key']):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= entry['size']
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'revalidated': self.revalidated,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+    def log_stats(self):
+        logging.info(f"HTTP cache: {self.hits} hits, {self.revalidated} revalidated (304), "
+                     f"{self.misses} misses, {self.evictions} evictions")
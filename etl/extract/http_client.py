@@ -0,0 +1,153 @@
+import aiohttp
+import asyncio
+import logging
+import random
+import time
+from urllib.parse import urlsplit
+
+from extract.json_stream import read_frame
+
+# Status HTTP transitórios, que valem nova tentativa
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HostRateLimiter:
+    """Limita o ritmo de requisições por host (intervalo mínimo entre inícios)"""
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._next_slot = {}
+        self._locks = {}
+
+    async def wait(self, host):
+        if not self.interval:
+            return
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class AsyncHttpClient:
+    """Cliente HTTP assíncrono com pool de conexões, concorrência limitada,
+    limite de requisições por host e novas tentativas com backoff exponencial
+
+    Deve ser usado como gerenciador de contexto assíncrono
+    (``async with AsyncHttpClient(...) as client``). Com um HttpResponseCache,
+    as respostas são reaproveitadas e revalidadas com requisições condicionais.
+    """
+
+    def __init__(self, headers=None, max_concurrency=8, rate_limit=10.0, max_retries=3,
+                 backoff_base=0.5, timeout=30, cache=None, batch_size=10000):
+        self.headers = headers or {}
+        self.cache = cache
+        # Registros por lote de colunas na leitura incremental das respostas
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        self.rate_limiter = HostRateLimiter(rate_limit)
+        self.session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.session = aiohttp.ClientSession(
+            headers=self.headers,
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff_base * (2 ** attempt) + random.uniform(0, self.backoff_base)
+
+    async def request(self, url, handler, params=None, headers=None):
+        """GET com novas tentativas em erros de rede e status transitórios
+
+        ``handler`` recebe a resposta (status não transitório) e produz o
+        resultado; erros ao ler o corpo também disparam nova tentativa.
+        """
+        host = urlsplit(url).netloc
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                await self.rate_limiter.wait(host)
+                async with self._semaphore:
+                    async with self.session.get(url, params=params, headers=headers) as response:
+                        if response.status not in RETRY_STATUSES:
+                            response.raise_for_status()
+                            return await handler(response)
+                        retry_after = response.headers.get('Retry-After')
+                        error = f"HTTP {response.status}"
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                error = f"{type(e).__name__}: {e}"
+
+            if attempt == self.max_retries:
+                raise RuntimeError(f"GET {url} failed after {attempt + 1} attempts ({error})")
+            delay = self._backoff(attempt, retry_after)
+            logging.warning(f"GET {url} failed ({error}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def get_frame(self, url, params=None, schema=None, ndjson=None):
+        """Busca uma resposta JSON (array ou NDJSON) como DataFrame, usando o cache
+
+        O corpo é interpretado incrementalmente, em lotes de colunas tipadas
+        segundo o ``schema`` (RecordSchema) quando informado.
+        """
+        # O schema faz parte da chave do cache: muda as colunas do DataFrame guardado
+        cache_params = {**(params or {}), '_schema': schema.fingerprint()} if schema else params
+        meta = self.cache.lookup(url, cache_params) if self.cache else None
+        if meta and self.cache.is_fresh(meta):
+            df = self.cache.load(meta)
+            if df is not None:
+                return df
+
+        async def parse(response):
+            if response.status == 304:
+                return None, response.headers
+            df = await read_frame(response, schema, self.batch_size, ndjson)
+            return df, response.headers
+
+        headers = self.cache.conditional_headers(meta) if meta else None
+        df, response_headers = await self.request(url, parse, params, headers)
+        if df is None:
+            df = self.cache.load(meta, revalidated=True)
+            if df is not None:
+                return df
+            # Entrada removida pelo LRU durante a requisição: buscar sem condicional
+            df, response_headers = await self.request(url, parse, params)
+        if self.cache:
+            self.cache.store(url, cache_params, df, response_headers)
+        return df
+
+    async def iter_pages(self, url, params=None, page_size=None, max_pages=1000, schema=None, ndjson=None):
+        """Percorre um endpoint paginado por ``_page``/``_limit``, página a página
+
+        Cada página é entregue como DataFrame. Sem ``page_size`` faz uma única
+        requisição. A paginação termina na primeira página vazia ou incompleta.
+        """
+        params = dict(params or {})
+        if not page_size:
+            yield await self.get_frame(url, params, schema, ndjson)
+            return
+
+        for page in range(1, max_pages + 1):
+            df = await self.get_frame(url, {**params, '_page': page, '_limit': page_size}, schema, ndjson)
+            if len(df):
+                yield df
+            if len(df) != page_size:
+                return
+        logging.warning(f"GET {url} stopped after {max_pages} pages")
@@ -0,0 +1,98 @@
+import pandas as pd
+import ijson
+import json
+
+# Content-Types tratados como JSON delimitado por linha
+NDJSON_CONTENT_TYPES = {'application/x-ndjson', 'application/ndjson', 'application/jsonl',
+                        'application/json-lines'}
+
+
+class RecordSchema:
+    """Schema declarado de um endpoint: coluna -> (caminho no JSON, dtype)
+
+    Caminhos aninhados usam ponto (ex.: ``address.geo.lat``), o que achata
+    objetos como ``address`` e ``company`` em colunas tipadas.
+    """
+
+    def __init__(self, columns):
+        self.columns = {
+            name: (tuple(path.split('.')), dtype) for name, (path, dtype) in columns.items()
+        }
+
+    def fingerprint(self):
+        return json.dumps({name: ['.'.join(path), dtype] for name, (path, dtype) in self.columns.items()})
+
+    @staticmethod
+    def _value(record, path):
+        for key in path:
+            if not isinstance(record, dict):
+                return None
+            record = record.get(key)
+        return record
+
+    def new_batch(self):
+        return {name: [] for name in self.columns}
+
+    def append(self, batch, record):
+        for name, (path, _) in self.columns.items():
+            batch[name].append(self._value(record, path))
+
+    def to_frame(self, batch):
+        data = {}
+        for name, (_, dtype) in self.columns.items():
+            values = batch[name]
+            if dtype in ('Int64', 'Float64', 'float64'):
+                data[name] = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').astype(dtype)
+            else:
+                data[name] = pd.Series(values, dtype=dtype)
+        return pd.DataFrame(data)
+
+
+async def iter_records(response, ndjson=None):
+    """Itera os registros do corpo da resposta à medida que ele chega
+
+    Aceita um array JSON (interpretado incrementalmente com ijson) ou NDJSON.
+    """
+    if ndjson is None:
+        ndjson = response.content_type in NDJSON_CONTENT_TYPES
+
+    if ndjson:
+        async for line in response.content:
+            if line.strip():
+                yield json.loads(line)
+        return
+
+    async for record in ijson.items_async(response.content, 'item', use_float=True):
+        yield record
+
+
+async def read_frame(response, schema=None, batch_size=10000, ndjson=None):
+    """Monta o DataFrame da resposta em lotes de colunas tipadas
+
+    Com schema, cada registro é distribuído nas listas das colunas e descartado;
+    a cada ``batch_size`` registros as listas viram colunas tipadas. Sem schema,
+    os lotes de registros são convertidos com pd.DataFrame.
+    """
+    frames = []
+    batch = schema.new_batch() if schema else []
+    rows = 0
+
+    def flush():
+        frames.append(schema.to_frame(batch) if schema else pd.DataFrame(batch))
+
+    async for record in iter_records(response, ndjson):
+        if schema:
+            schema.append(batch, record)
+        else:
+            batch.append(record)
+        rows += 1
+        if rows == batch_size:
+            flush()
+            batch = schema.new_batch() if schema else []
+            rows = 0
+
+    if rows or not frames:
+        flush()
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,151 @@
+from sqlalchemy import bindparam, create_engine, inspect, text
+import logging
+import os
+
+
+class WatermarkStore:
+    """Persiste as marcas d'água (high-water marks) da extração incremental
+
+    A extração não avança a marca diretamente: grava uma marca candidata por
+    execução (``stage``) em ``<tabela>_pending``. A carga, depois de concluída
+    com sucesso, promove as candidatas da execução (``commit``). Se a
+    transformação ou a carga falham, a marca gravada não muda e a próxima
+    execução extrai o mesmo delta de novo.
+    """
+
+    def __init__(self, engine, table_name='etl_watermarks'):
+        self.engine = engine
+        self.table_name = table_name
+        self.pending_table_name = f"{table_name}_pending"
+
+    def create_table(self):
+        """Cria as tabelas de estado (marcas gravadas e candidatas) se não existirem"""
+        create_table_sql = f"""
+        CREATE TABLE IF NOT EXISTS {self.table_name} (
+            source_table VARCHAR(100) PRIMARY KEY,
+            watermark_column VARCHAR(255),
+            watermark_value TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS {self.pending_table_name} (
+            run_id VARCHAR(255),
+            source_table VARCHAR(100),
+            watermark_column VARCHAR(255),
+            watermark_value TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (run_id, source_table)
+        );
+        """
+
+        with self.engine.connect() as conn:
+            conn.execute(text(create_table_sql))
+            conn.commit()
+
+    def get(self, source_table):
+        """Retorna a marca d'água atual da tabela de origem (ou None)"""
+        with self.engine.connect() as conn:
+            return conn.execute(
+                text(f"SELECT watermark_value FROM {self.table_name} WHERE source_table = :source_table"),
+                {'source_table': source_table}
+            ).scalar()
+
+    def set(self, source_table, watermark_column, watermark_value):
+        """Grava (ou avança) a marca d'água da tabela de origem"""
+        with self.engine.connect() as conn:
+            conn.execute(text(f"""
+                INSERT INTO {self.table_name} (source_table, watermark_column, watermark_value, updated_at)
+                VALUES (:source_table, :watermark_column, :watermark_value, CURRENT_TIMESTAMP)
+                ON CONFLICT (source_table) DO UPDATE SET
+                    watermark_column = EXCLUDED.watermark_column,
+                    watermark_value = EXCLUDED.watermark_value,
+                    updated_at = EXCLUDED.updated_at
+            """), {
+                'source_table': source_table,
+                'watermark_column': watermark_column,
+                'watermark_value': str(watermark_value)
+            })
+            conn.commit()
+
+        logging.info(f"Watermark for {source_table} set to {watermark_value}")
+
+    def stage(self, run_id, source_table, watermark_column, watermark_value):
+        """Grava a marca candidata da execução (promovida por ``commit`` após a carga)"""
+        with self.engine.connect() as conn:
+            conn.execute(text(f"""
+                INSERT INTO {self.pending_table_name} (run_id, source_table, watermark_column,
+                                                       watermark_value, created_at)
+                VALUES (:run_id, :source_table, :watermark_column, :watermark_value, CURRENT_TIMESTAMP)
+                ON CONFLICT (run_id, source_table) DO UPDATE SET
+                    watermark_column = EXCLUDED.watermark_column,
+                    watermark_value = EXCLUDED.watermark_value,
+                    created_at = EXCLUDED.created_at
+            """), {
+                'run_id': run_id,
+                'source_table': source_table,
+                'watermark_column': watermark_column,
+                'watermark_value': str(watermark_value)
+            })
+            conn.commit()
+
+        logging.info(f"Watermark candidate for {source_table} staged at {watermark_value} (run {run_id})")
+
+    def commit(self, run_id, source_tables=None):
+        """Promove as marcas candidatas da execução a marcas gravadas
+
+        ``source_tables`` restringe as tabelas promovidas (ex.: só ``sales``
+        depois da carga da fato). Sem a tabela de candidatas (extração por
+        janela), não há nada a promover.
+        """
+        if not inspect(self.engine).has_table(self.pending_table_name):
+            return []
+        tables_filter = 'AND source_table IN :source_tables' if source_tables else ''
+        params = {'run_id': run_id}
+        statement = text(f"""
+            DELETE FROM {self.pending_table_name}
+            WHERE run_id = :run_id {tables_filter}
+            RETURNING source_table, watermark_column, watermark_value
+        """)
+        if source_tables:
+            statement = statement.bindparams(bindparam('source_tables', expanding=True))
+            params['source_tables'] = list(source_tables)
+
+        # Remoção das candidatas e avanço das marcas na mesma transação
+        with self.engine.begin() as conn:
+            promoted = conn.execute(statement, params).fetchall()
+            for source_table, watermark_column, watermark_value in promoted:
+                conn.execute(text(f"""
+                    INSERT INTO {self.table_name} (source_table, watermark_column, watermark_value, updated_at)
+                    VALUES (:source_table, :watermark_column, :watermark_value, CURRENT_TIMESTAMP)
+                    ON CONFLICT (source_table) DO UPDATE SET
+                        watermark_column = EXCLUDED.watermark_column,
+                        watermark_value = EXCLUDED.watermark_value,
+                        updated_at = EXCLUDED.updated_at
+                """), {
+                    'source_table': source_table,
+                    'watermark_column': watermark_column,
+                    'watermark_value': watermark_value
+                })
+
+        for source_table, _, watermark_value in promoted:
+            logging.info(f"Watermark for {source_table} set to {watermark_value} (run {run_id})")
+        return [source_table for source_table, _, _ in promoted]
+
+    def reset(self, source_table=None):
+        """Remove as marcas d'água (de uma tabela ou de todas), forçando carga completa"""
+        with self.engine.connect() as conn:
+            if source_table:
+                conn.execute(text(f"DELETE FROM {self.table_name} WHERE source_table = :source_table"),
+                             {'source_table': source_table})
+            else:
+                conn.execute(text(f"DELETE FROM {self.table_name}"))
+            conn.commit()
+
+
+def get_watermark_store(default_connection_string=None):
+    """Marcas d'água no banco do ETL: ETL_STATE_DB_CONNECTION (por padrão, o warehouse)"""
+    connection_string = os.getenv(
+        'ETL_STATE_DB_CONNECTION',
+        os.getenv('WAREHOUSE_DB_CONNECTION', default_connection_string)
+    )
+    return WatermarkStore(create_engine(connection_string))
@@ -0,0 +1,129 @@
+import pandas as pd
+import numpy as np
+from sqlalchemy import text
+import logging
+import json
+import os
+
+
+# Contador de versões das dimensões, incrementado na mesma transação da carga
+VERSION_TABLE = 'etl_dimension_versions'
+
+
+def bump_dimension_version(conn, table_name):
+    """Incrementa a versão da dimensão (chamar na transação que a alterou)"""
+    conn.execute(text(f"""
+        INSERT INTO {VERSION_TABLE} (table_name, version, updated_at)
+        VALUES (:table_name, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (table_name) DO UPDATE SET
+            version = {VERSION_TABLE}.version + 1,
+            updated_at = EXCLUDED.updated_at
+    """), {'table_name': table_name})
+
+
+class SurrogateKeyResolver:
+    """Resolve chaves naturais em chaves substitutas de uma dimensão
+
+    O mapa chave natural -> chave substituta das versões correntes fica em um
+    índice em memória (compartilhado entre instâncias do mesmo processo) e,
+    opcionalmente, em disco (WAREHOUSE_KEY_CACHE=disk), que é o que sobrevive
+    entre os processos das tasks do Airflow. Antes de usar o mapa, a versão da
+    dimensão é lida de ``etl_dimension_versions`` (contador incrementado pela
+    carga na mesma transação) junto com o filenode da tabela, que muda em
+    TRUNCATE ou recriação; o mapa só é relido quando ela muda.
+    """
+
+    # Mapas em memória por (banco, tabela): {'version': ..., 'index': ..., 'keys': ...}
+    _memory_cache = {}
+
+    def __init__(self, engine, table_name, natural_key, surrogate_key, cache_store=None):
+        self.engine = engine
+        self.table_name = table_name
+        self.natural_key = natural_key
+        self.surrogate_key = surrogate_key
+        # DataStore opcional onde o mapa é persistido entre execuções
+        self.cache_store = cache_store
+        self.cache_key = (engine.url.render_as_string(hide_password=True), table_name)
+        self.logger = logging.getLogger(__name__)
+
+    def dimension_version(self):
+        """Versão atual da dimensão (muda a cada carga que a altera)
+
+        Lê uma linha do contador, sem varrer a dimensão. Em warehouses sem a
+        tabela de versões, usa um agregado sobre as versões correntes.
+        """
+        with self.engine.connect() as conn:
+            if conn.execute(text("SELECT to_regclass(:table_name)"),
+                            {'table_name': VERSION_TABLE}).scalar() is not None:
+                row = conn.execute(text(f"""
+                    SELECT (SELECT version FROM {VERSION_TABLE} WHERE table_name = :table_name),
+                           pg_relation_filenode(CAST(:table_name AS regclass))
+                """), {'table_name': self.table_name}).one()
+            else:
+                row = conn.execute(text(f"""
+                    SELECT COUNT(*), MAX({self.surrogate_key}), MAX(updated_date)
+                    FROM {self.table_name} WHERE is_current
+                """)).one()
+        return [str(value) for value in row]
+
+    def _version_path(self):
+        return os.path.join(self.cache_store.base_dir, f"{self.table_name}_keys.version.json")
+
+    def _load_from_disk(self, version):
+        name = f"{self.table_name}_keys"
+        if not self.cache_store.exists(name) or not os.path.exists(self._version_path()):
+            return None
+        with open(self._version_path()) as f:
+            if json.load(f) != version:
+                return None
+        return self.cache_store.read(name)
+
+    def _save_to_disk(self, key_map, version):
+        self.cache_store.write(key_map, f"{self.table_name}_keys")
+        with open(self._version_path(), 'w') as f:
+            json.dump(version, f)
+
+    def _read_key_map(self):
+        with self.engine.connect() as conn:
+            return pd.read_sql(text(
+                f"SELECT {self.natural_key}, {self.surrogate_key} FROM {self.table_name} WHERE is_current"
+            ), conn)
+
+    def key_index(self):
+        """Retorna (índice das chaves naturais, array das chaves substitutas) atualizados"""
+        version = self.dimension_version()
+        cached = self._memory_cache.get(self.cache_key)
+        if cached and cached['version'] == version:
+            return cached['index'], cached['keys']
+
+        key_map = None
+        if self.cache_store is not None:
+            key_map = self._load_from_disk(version)
+        source = 'disk cache'
+        if key_map is None:
+            key_map = self._read_key_map()
+            source = 'database'
+            if self.cache_store is not None:
+                self._save_to_disk(key_map, version)
+
+        index = pd.Index(key_map[self.natural_key].to_numpy())
+        keys = key_map[self.surrogate_key].to_numpy(dtype=np.int64)
+        self._memory_cache[self.cache_key] = {'version': version, 'index': index, 'keys': keys}
+        self.logger.info(f"{self.table_name} key map loaded from {source}: {len(keys)} keys")
+        return index, keys
+
+    def resolve(self, natural_keys):
+        """Resolve as chaves naturais de uma vez (busca vetorizada no índice)
+
+        Retorna uma Series Int64 alinhada à entrada, com <NA> nas chaves que não
+        têm versão corrente na dimensão.
+        """
+        natural_keys = pd.Series(natural_keys)
+        index, keys = self.key_index()
+        positions = index.get_indexer(natural_keys.to_numpy())
+        found = positions >= 0
+
+        resolved = pd.array(np.zeros(len(positions), dtype=np.int64), dtype='Int64')
+        resolved[found] = keys[positions[found]]
+        resolved[~found] = pd.NA
+        return pd.Series(resolved, index=natural_keys.index)
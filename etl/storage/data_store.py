@@ -0,0 +1,410 @@
+import pandas as pd
+import logging
+from abc import ABC, abstractmethod
+import os
+import re
+import shutil
+from datetime import datetime, timedelta
+
+# Diretório base dos dados do pipeline e formato padrão dos arquivos intermediários
+DEFAULT_DATA_DIR = '/opt/airflow/data'
+DEFAULT_FORMAT = 'parquet'
+
+# Zonas com os datasets de cada execução em partições próprias (ver RunPartition);
+# as demais (quality, key_cache, caches) são compartilhadas entre execuções
+PARTITIONED_ZONES = ('raw', 'processed')
+
+
+class RunPartition:
+    """Partição dos datasets de uma execução do pipeline
+
+    Nas zonas de PARTITIONED_ZONES os datasets de cada execução ficam em
+    ``<zona>/dt=<data lógica>/run=<id da execução>/``, de modo que execuções
+    concorrentes e backfills não sobrescrevem os arquivos umas das outras.
+    ``start_date``/``end_date`` (intervalo de dados da execução, datas ou
+    timestamps ISO) definem a janela da extração. Uma fatia da janela
+    (``slices``) tem o próprio subdiretório ``part=<n>``.
+    """
+
+    def __init__(self, logical_date, run_id='manual', start_date=None, end_date=None, part=None):
+        self.logical_date = str(logical_date)[:10]
+        # IDs do Airflow (ex.: scheduled__2024-01-01T00:00:00+00:00) viram nomes seguros
+        self.run_id = re.sub(r'[^A-Za-z0-9_.-]', '_', run_id)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.part = part
+
+    def path(self, zone_dir):
+        path = os.path.join(zone_dir, f"dt={self.logical_date}", f"run={self.run_id}")
+        return path if self.part is None else os.path.join(path, f"part={self.part}")
+
+    def slices(self, slice_hours):
+        """Divide a janela em fatias consecutivas de até ``slice_hours`` horas
+
+        As fatias são semiabertas ``[início, fim)``, como o filtro da extração:
+        o fim de uma é o início da próxima e nenhuma venda cai em duas fatias.
+        """
+        start = pd.Timestamp(self.start_date)
+        end = pd.Timestamp(self.end_date)
+        count = max(1, int(-(-(end - start) // pd.Timedelta(hours=slice_hours))))
+        bounds = [start + (end - start) * index / count for index in range(count + 1)]
+        return [RunPartition(self.logical_date, self.run_id, bounds[index].isoformat(),
+                             bounds[index + 1].isoformat(), part=index)
+                for index in range(count)]
+
+    def to_dict(self):
+        return {'logical_date': self.logical_date, 'run_id': self.run_id,
+                'start_date': self.start_date, 'end_date': self.end_date, 'part': self.part}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    @classmethod
+    def from_env(cls):
+        """Partição definida por ETL_LOGICAL_DATE/ETL_RUN_ID (None sem data lógica)"""
+        logical_date = os.getenv('ETL_LOGICAL_DATE')
+        if not logical_date:
+            return None
+        return cls(logical_date, os.getenv('ETL_RUN_ID', 'manual'))
+
+    def __repr__(self):
+        part = '' if self.part is None else f", part={self.part}"
+        return f"RunPartition(dt={self.logical_date}, run={self.run_id}{part})"
+
+
+class DataStore(ABC):
+    """Armazenamento dos datasets intermediários de uma zona (raw, processed, ...)
+
+    Cada dataset é identificado por um nome lógico (ex.: ``sales_data``) e
+    gravado em ``<base_dir>/<nome>.<extensão>``. Cada formato implementa
+    ``read``, ``iter_chunks``, ``open_writer`` e ``concat``.
+    """
+
+    extension = None
+
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+
+    def path(self, name):
+        return os.path.join(self.base_dir, f"{name}.{self.extension}")
+
+    def exists(self, name):
+        return os.path.exists(self.path(name))
+
+    def size(self, name):
+        """Tamanho do dataset em bytes"""
+        return os.path.getsize(self.path(name))
+
+    def row_count(self, name):
+        """Número de linhas do dataset (sem ler os dados, quando o formato permite)"""
+        with open(self.path(name), 'rb') as f:
+            return max(sum(1 for _ in f) - 1, 0)
+
+    def remove(self, name):
+        if self.exists(name):
+            os.remove(self.path(name))
+
+    def write(self, df, name):
+        """Grava o DataFrame inteiro, substituindo o dataset"""
+        with self.open_writer(name) as writer:
+            writer.write(df)
+
+    @abstractmethod
+    def read(self, name, columns=None):
+        """Lê o dataset inteiro (ou só ``columns``)"""
+
+    @abstractmethod
+    def iter_chunks(self, name, chunk_size, columns=None):
+        """Lê o dataset em blocos de até ``chunk_size`` linhas"""
+
+    @abstractmethod
+    def open_writer(self, name):
+        """Abre um gravador incremental (gerenciador de contexto) para o dataset"""
+
+    def partitions(self, name, count):
+        """Divide o dataset em até ``count`` partições que podem ser lidas de forma
+        independente (ex.: por processos diferentes). ``None`` é o dataset inteiro."""
+        return [None]
+
+    def iter_partition(self, name, partition, chunk_size, columns=None):
+        """Lê uma partição (ver ``partitions``) em blocos de até ``chunk_size`` linhas"""
+        return self.iter_chunks(name, chunk_size, columns)
+
+    @abstractmethod
+    def concat(self, part_names, name, remove_parts=True):
+        """Concatena datasets (na ordem dada) em um único dataset"""
+
+
+class CsvStore(DataStore):
+    """Datasets em CSV (formato opcional, sem preservação de tipos)"""
+
+    extension = 'csv'
+
+    def read(self, name, columns=None):
+        return pd.read_csv(self.path(name), usecols=columns)
+
+    def iter_chunks(self, name, chunk_size, columns=None):
+        for chunk in pd.read_csv(self.path(name), usecols=columns, chunksize=chunk_size):
+            yield chunk
+
+    def open_writer(self, name):
+        os.makedirs(self.base_dir, exist_ok=True)
+        return CsvChunkWriter(self.path(name))
+
+    def concat(self, part_names, name, remove_parts=True):
+        # Copia os bytes das partes, mantendo apenas o cabeçalho da primeira
+        with open(self.path(name), 'wb') as output:
+            for index, part_name in enumerate(part_names):
+                with open(self.path(part_name), 'rb') as part:
+                    header = part.readline()
+                    if index == 0:
+                        output.write(header)
+                    shutil.copyfileobj(part, output)
+        if remove_parts:
+            for part_name in part_names:
+                self.remove(part_name)
+
+
+class ParquetStore(DataStore):
+    """Datasets em Parquet: colunar, comprimido e com os tipos preservados"""
+
+    extension = 'parquet'
+
+    def __init__(self, base_dir, compression=None):
+        super().__init__(base_dir)
+        self.compression = compression or os.getenv('ETL_PARQUET_COMPRESSION', 'snappy')
+
+    def read(self, name, columns=None):
+        return pd.read_parquet(self.path(name), columns=columns)
+
+    def row_count(self, name):
+        # Contagem dos metadados do arquivo
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(self.path(name)).metadata.num_rows
+
+    def iter_chunks(self, name, chunk_size, columns=None):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(self.path(name))
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+
+    def open_writer(self, name):
+        os.makedirs(self.base_dir, exist_ok=True)
+        return ParquetChunkWriter(self.path(name), self.compression)
+
+    def partitions(self, name, count):
+        # Partições são faixas contíguas de row groups
+        import pyarrow.parquet as pq
+
+        row_groups = list(range(pq.ParquetFile(self.path(name)).num_row_groups))
+        if len(row_groups) <= 1 or count <= 1:
+            return [None]
+        size = -(-len(row_groups) // count)
+        return [row_groups[start:start + size] for start in range(0, len(row_groups), size)]
+
+    def iter_partition(self, name, partition, chunk_size, columns=None):
+        import pyarrow.parquet as pq
+
+        if partition is None:
+            yield from self.iter_chunks(name, chunk_size, columns)
+            return
+        parquet_file = pq.ParquetFile(self.path(name))
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, row_groups=partition, columns=columns):
+            yield batch.to_pandas()
+
+    def concat(self, part_names, name, remove_parts=True):
+        _merge_parquet_files([self.path(part_name) for part_name in part_names],
+                             self.path(name), self.compression)
+        if remove_parts:
+            for part_name in part_names:
+                self.remove(part_name)
+
+
+class CsvChunkWriter:
+    """Grava DataFrames incrementalmente em um arquivo CSV"""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._started = False
+
+    def write(self, df):
+        df.to_csv(self.path, mode='a' if self._started else 'w', header=not self._started, index=False)
+        self._started = True
+        self.rows += len(df)
+
+    def close(self):
+        if not self._started:
+            open(self.path, 'w').close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ParquetChunkWriter:
+    """Grava DataFrames incrementalmente em um arquivo Parquet (um row group por bloco)
+
+    O schema do arquivo vem do primeiro bloco. Se um bloco posterior não couber
+    nele (ex.: coluna toda nula no primeiro bloco), um novo segmento é aberto e,
+    ao fechar, os segmentos são unificados no arquivo final.
+    """
+
+    def __init__(self, path, compression='snappy'):
+        self.path = path
+        self.compression = compression
+        self.rows = 0
+        self._segments = []
+        self._writer = None
+        self._schema = None
+
+    def _open_segment(self, schema):
+        import pyarrow.parquet as pq
+
+        if self._writer is not None:
+            self._writer.close()
+        segment_path = f"{self.path}.segment-{len(self._segments)}"
+        self._segments.append(segment_path)
+        self._writer = pq.ParquetWriter(segment_path, schema, compression=self.compression)
+        self._schema = schema
+
+    def write(self, df):
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._open_segment(table.schema)
+        elif not table.schema.equals(self._schema):
+            try:
+                table = table.cast(self._schema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, ValueError):
+                self._open_segment(table.schema)
+
+        self._writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            pq.write_table(pa.table({}), self.path, compression=self.compression)
+            return
+
+        self._writer.close()
+        self._writer = None
+        if len(self._segments) == 1:
+            os.replace(self._segments[0], self.path)
+            return
+
+        _merge_parquet_files(self._segments, self.path, self.compression)
+        for segment_path in self._segments:
+            os.remove(segment_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self._writer is not None:
+            self._writer.close()
+            for segment_path in self._segments:
+                os.remove(segment_path)
+            return
+        self.close()
+
+
+def _unify_schemas(schemas):
+    import pyarrow as pa
+
+    try:
+        return pa.unify_schemas(schemas, promote_options='permissive')
+    except TypeError:
+        # pyarrow < 14 não tem promote_options (mas já unifica colunas nulas)
+        return pa.unify_schemas(schemas)
+
+
+def _merge_parquet_files(paths, output_path, compression='snappy'):
+    """Concatena arquivos Parquet row group a row group, sem carregá-los inteiros"""
+    import pyarrow.parquet as pq
+
+    if len(paths) == 1:
+        shutil.copyfile(paths[0], output_path)
+        return
+
+    parquet_files = [pq.ParquetFile(path) for path in paths]
+    schemas = [parquet_file.schema_arrow for parquet_file in parquet_files]
+    schema = schemas[0]
+    if not all(other.equals(schema) for other in schemas[1:]):
+        schema = _unify_schemas(schemas)
+
+    with pq.ParquetWriter(output_path, schema, compression=compression) as writer:
+        for parquet_file in parquet_files:
+            for index in range(parquet_file.num_row_groups):
+                table = parquet_file.read_row_group(index)
+                if not table.schema.equals(schema):
+                    table = table.select(schema.names).cast(schema)
+                writer.write_table(table)
+
+
+def get_store(zone, data_format=None, data_dir=None, partition=None):
+    """Retorna o armazenamento da zona (raw, processed, ...) no formato configurado
+
+    O formato vem da variável ETL_STORAGE_FORMAT (``parquet`` por padrão ou
+    ``csv``) e o diretório base de ETL_DATA_DIR. Com ``partition`` (RunPartition),
+    as zonas particionadas usam o diretório da execução.
+    """
+    data_format = (data_format or os.getenv('ETL_STORAGE_FORMAT', DEFAULT_FORMAT)).lower()
+    base_dir = os.path.join(data_dir or os.getenv('ETL_DATA_DIR', DEFAULT_DATA_DIR), zone)
+    if partition is not None and zone in PARTITIONED_ZONES:
+        base_dir = partition.path(base_dir)
+
+    if data_format == 'parquet':
+        return ParquetStore(base_dir)
+    if data_format == 'csv':
+        return CsvStore(base_dir)
+
+    logging.error(f"Unsupported storage format: {data_format}")
+    raise ValueError(f"Unsupported storage format: {data_format}")
+
+
+def cleanup_partitions(zone, retention_days, data_dir=None, now=None):
+    """Remove as partições de execução da zona mais antigas que ``retention_days``
+
+    Uma execução (``dt=.../run=...``) só é removida se a data lógica e a última
+    modificação dos arquivos forem anteriores ao limite: backfills de datas
+    antigas ainda em andamento são preservados. Retorna os diretórios removidos.
+    """
+    zone_dir = os.path.join(data_dir or os.getenv('ETL_DATA_DIR', DEFAULT_DATA_DIR), zone)
+    if not os.path.isdir(zone_dir):
+        return []
+
+    cutoff = (now or datetime.now()) - timedelta(days=retention_days)
+    removed = []
+    for dt_name in sorted(os.listdir(zone_dir)):
+        try:
+            logical_date = datetime.strptime(dt_name, 'dt=%Y-%m-%d')
+        except ValueError:
+            continue
+        if logical_date >= cutoff:
+            continue
+
+        dt_dir = os.path.join(zone_dir, dt_name)
+        for run_name in os.listdir(dt_dir):
+            run_dir = os.path.join(dt_dir, run_name)
+            # Arquivo mais recente da execução, inclusive nas fatias (part=<n>/)
+            modified = max(os.path.getmtime(os.path.join(root, name))
+                           for root, dir_names, file_names in os.walk(run_dir)
+                           for name in ['.'] + file_names)
+            if modified < cutoff.timestamp():
+                shutil.rmtree(run_dir)
+                removed.append(run_dir)
+        if not os.listdir(dt_dir):
+            os.rmdir(dt_dir)
+
+    logging.info(f"Removed {len(removed)} {zone} partitions older than {retention_days} days")
+    return removed
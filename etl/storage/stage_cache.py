@@ -0,0 +1,206 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+
+from storage.data_store import DEFAULT_DATA_DIR
+
+# Extensões consideradas "código" ao calcular a versão de uma etapa
+CODE_EXTENSIONS = ('.py', '.json')
+
+
+def file_digest(path, block_size=1024 * 1024):
+    """SHA-256 do conteúdo de um arquivo, lido em blocos ('missing' se não existe)"""
+    if not os.path.exists(path):
+        return 'missing'
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class StageCache:
+    """Cache endereçado por conteúdo das saídas de uma etapa do pipeline
+
+    A chave de uma execução é o hash das entradas (conteúdo dos arquivos), do
+    código da etapa (arquivos ``.py``/``.json`` dos módulos) e da configuração
+    que altera o resultado. Com a mesma chave, a etapa produziria as mesmas
+    saídas: elas são copiadas de ``<cache_dir>/<etapa>/<chave>/`` em vez de
+    recalculadas. Só etapas cujo resultado depende apenas das entradas podem
+    usar o cache: a carga no warehouse depende também do estado do destino.
+
+    Entradas mais antigas que ``max_age`` segundos expiram e o tamanho total é
+    limitado a ``max_bytes``, removendo as menos usadas recentemente (LRU).
+    """
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, cache_dir, max_age=24 * 3600, max_bytes=1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def _code_files(paths):
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                for root, dirs, names in os.walk(path):
+                    dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+                    files += [os.path.join(root, name) for name in sorted(names)
+                              if name.endswith(CODE_EXTENSIONS)]
+            else:
+                files.append(path)
+        return files
+
+    def fingerprint(self, stage, inputs, code=(), config=None):
+        """Chave da execução: hash das entradas, do código e da configuração"""
+        digest = hashlib.sha256(stage.encode())
+        for path in inputs:
+            digest.update(f"input:{os.path.basename(path)}:{file_digest(path)}\n".encode())
+        for path in self._code_files(code):
+            digest.update(f"code:{os.path.basename(path)}:{file_digest(path)}\n".encode())
+        digest.update(json.dumps(sorted((config or {}).items()), default=str).encode())
+        return digest.hexdigest()
+
+    def _entry_dir(self, stage, key):
+        return os.path.join(self.cache_dir, stage, key)
+
+    def _write_manifest(self, manifest):
+        # Substituição atômica: leituras concorrentes nunca veem o arquivo pela metade
+        path = os.path.join(self._entry_dir(manifest['stage'], manifest['key']), self.MANIFEST)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, path)
+
+    def _is_expired(self, manifest):
+        return self.max_age > 0 and time.time() - manifest['created_at'] > self.max_age
+
+    def lookup(self, stage, key):
+        """Manifesto da entrada válida para a chave (ou None, registrando um miss)"""
+        path = os.path.join(self._entry_dir(stage, key), self.MANIFEST)
+        manifest = None
+        if os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+            if self._is_expired(manifest):
+                self._remove(manifest)
+                manifest = None
+
+        if manifest is None:
+            self.misses += 1
+            self.logger.info(f"Stage cache miss: {stage} ({key[:12]})")
+            return None
+        self.hits += 1
+        manifest['accessed_at'] = time.time()
+        self._write_manifest(manifest)
+        self.logger.info(f"Stage cache hit: {stage} ({key[:12]}, created "
+                         f"{time.time() - manifest['created_at']:.0f}s ago)")
+        return manifest
+
+    def restore(self, manifest, output_dir):
+        """Copia as saídas da entrada para o diretório da etapa"""
+        os.makedirs(output_dir, exist_ok=True)
+        entry_dir = self._entry_dir(manifest['stage'], manifest['key'])
+        for name in manifest['outputs']:
+            target = os.path.join(output_dir, name)
+            shutil.copyfile(os.path.join(entry_dir, name), f"{target}.tmp")
+            os.replace(f"{target}.tmp", target)
+
+    def store(self, stage, key, outputs=()):
+        """Grava as saídas da execução sob a chave e aplica a expiração e o limite de tamanho"""
+        entry_dir = self._entry_dir(stage, key)
+        # Diretório temporário próprio: execuções concorrentes podem gravar a mesma chave
+        staging_dir = f"{entry_dir}.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        os.makedirs(staging_dir)
+
+        names = []
+        for path in outputs:
+            if os.path.exists(path):
+                shutil.copyfile(path, os.path.join(staging_dir, os.path.basename(path)))
+                names.append(os.path.basename(path))
+
+        now = time.time()
+        manifest = {
+            'stage': stage,
+            'key': key,
+            'outputs': names,
+            'created_at': now,
+            'accessed_at': now,
+            'size': sum(os.path.getsize(os.path.join(staging_dir, name)) for name in names)
+        }
+        with open(os.path.join(staging_dir, self.MANIFEST), 'w') as f:
+            json.dump(manifest, f)
+
+        # A entrada só fica visível completa (renomeação do diretório); se outra
+        # execução já gravou a mesma chave, o conteúdo é o mesmo e a cópia é descartada
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        try:
+            os.rename(staging_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        self.logger.info(f"Stage cache stored: {stage} ({key[:12]}, {len(names)} outputs, "
+                         f"{manifest['size']} bytes)")
+        self.evict()
+
+    def _remove(self, manifest):
+        shutil.rmtree(self._entry_dir(manifest['stage'], manifest['key']), ignore_errors=True)
+        self.evictions += 1
+
+    def _entries(self):
+        entries = []
+        for stage in os.listdir(self.cache_dir):
+            stage_dir = os.path.join(self.cache_dir, stage)
+            if not os.path.isdir(stage_dir):
+                continue
+            for key in os.listdir(stage_dir):
+                path = os.path.join(stage_dir, key, self.MANIFEST)
+                if os.path.exists(path):
+                    with open(path) as f:
+                        entries.append(json.load(f))
+        return entries
+
+    def evict(self):
+        """Remove as entradas expiradas e, acima do limite de tamanho, as menos usadas"""
+        entries = []
+        for entry in self._entries():
+            if self._is_expired(entry):
+                self._remove(entry)
+            else:
+                entries.append(entry)
+
+        total = sum(entry['size'] for entry in entries)
+        for entry in sorted(entries, key=lambda entry: entry['accessed_at']):
+            if total <= self.max_bytes:
+                break
+            self._remove(entry)
+            total -= entry['size']
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+def get_stage_cache(data_dir=None):
+    """Cache de etapas configurado pelo ambiente (None se STAGE_CACHE=false)"""
+    if os.getenv('STAGE_CACHE', 'true').lower() != 'true':
+        return None
+    data_dir = data_dir or os.getenv('ETL_DATA_DIR', DEFAULT_DATA_DIR)
+    return StageCache(
+        os.getenv('STAGE_CACHE_DIR', os.path.join(data_dir, 'stage_cache')),
+        max_age=float(os.getenv('STAGE_CACHE_MAX_AGE', str(24 * 3600))),
+        max_bytes=int(os.getenv('STAGE_CACHE_MAX_BYTES', str(1024 * 1024 * 1024)))
+    )
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import tempfile
+import time
+import unittest
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from extract.http_cache import HttpResponseCache
+from extract.http_client import AsyncHttpClient
+
+RECORDS = [{'id': i, 'name': f'user {i}'} for i in range(1, 26)]
+
+
+class StubApi:
+    """Servidor aiohttp local com falhas programadas antes das respostas
+
+    ``failures`` define os status (e o Retry-After, se houver) devolvidos antes
+    da resposta de sucesso; ``requests`` guarda a query e os cabeçalhos
+    condicionais de cada requisição recebida.
+    """
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.requests = []
+
+    async def handle(self, request):
+        self.requests.append({
+            'query': dict(request.query),
+            'if_none_match': request.headers.get('If-None-Match')
+        })
+        if self.failures:
+            status, retry_after = self.failures.pop(0)
+            headers = {'Retry-After': retry_after} if retry_after is not None else {}
+            return web.Response(status=status, headers=headers)
+
+        records = RECORDS
+        if '_page' in request.query:
+            page, limit = int(request.query['_page']), int(request.query['_limit'])
+            records = records[(page - 1) * limit:page * limit]
+        body = json.dumps(records).encode()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.Response(body=body, content_type='application/json', headers={'ETag': etag})
+
+
+class AsyncHttpClientTest(unittest.IsolatedAsyncioTestCase):
+
+    async def start(self, failures=()):
+        self.api = StubApi(failures)
+        app = web.Application()
+        app.router.add_get('/users', self.api.handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.addAsyncCleanup(self.server.close)
+        return str(self.server.make_url('/users'))
+
+    def client(self, **kwargs):
+        # Sem backoff nem limite por host: os testes não esperam além do Retry-After
+        return AsyncHttpClient(rate_limit=0, backoff_base=0, timeout=5, **kwargs)
+
+    async def test_retries_transient_statuses(self):
+        url = await self.start(failures=[(429, None), (503, None), (500, None)])
+        async with self.client(max_retries=3) as client:
+            df = await client.get_frame(url)
+
+        self.assertEqual(len(df), len(RECORDS))
+        self.assertEqual(len(self.api.requests), 4)
+
+    async def test_gives_up_after_max_retries(self):
+        url = await self.start(failures=[(503, None)] * 3)
+        async with self.client(max_retries=2) as client:
+            with self.assertRaisesRegex(RuntimeError, 'failed after 3 attempts'):
+                await client.get_frame(url)
+
+        self.assertEqual(len(self.api.requests), 3)
+
+    async def test_does_not_retry_client_errors(self):
+        url = await self.start(failures=[(404, None)])
+        async with self.client(max_retries=3) as client:
+            with self.assertRaises(aiohttp.ClientResponseError):
+                await client.get_frame(url)
+
+        self.assertEqual(len(self.api.requests), 1)
+
+    async def test_waits_retry_after(self):
+        url = await self.start(failures=[(429, '0.3')])
+        started = time.monotonic()
+        async with self.client(max_retries=1) as client:
+            df = await client.get_frame(url)
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+        self.assertEqual(len(df), len(RECORDS))
+
+    async def test_paginates_until_partial_page(self):
+        url = await self.start()
+        async with self.client() as client:
+            pages = [df async for df in client.iter_pages(url, page_size=10)]
+
+        self.assertEqual([len(df) for df in pages], [10, 10, 5])
+        self.assertEqual([request['query']['_page'] for request in self.api.requests], ['1', '2', '3'])
+        self.assertEqual(pages[-1]['id'].tolist(), list(range(21, 26)))
+
+    async def test_revalidates_cached_response_with_etag(self):
+        url = await self.start(failures=[(503, '0')])
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = HttpResponseCache(cache_dir)
+            async with self.client(cache=cache) as client:
+                first = await client.get_frame(url)
+                second = await client.get_frame(url)
+
+            self.assertEqual(cache.misses, 1)
+            self.assertEqual(cache.revalidated, 1)
+
+        # 503, 200 com ETag e, na segunda busca, requisição condicional respondida com 304
+        self.assertEqual(len(self.api.requests), 3)
+        self.assertIsNone(self.api.requests[1]['if_none_match'])
+        self.assertIsNotNone(self.api.requests[2]['if_none_match'])
+        self.assertTrue(first.equals(second))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,231 @@
+import pandas as pd
+import numpy as np
+import logging
+import time
+from datetime import datetime
+
+# Precisão dos sketches HyperLogLog: 2^12 registradores (erro ~1,6%). Com 12
+# bits de registrador sobram 52 bits do hash, representáveis exatamente em float64
+HLL_PRECISION = 12
+HLL_REGISTERS = 1 << HLL_PRECISION
+HLL_VALUE_BITS = 64 - HLL_PRECISION
+
+# Tamanho da amostra bottom-k usada como sketch de quantis (erro de posto ~1/sqrt(k))
+QUANTILE_SAMPLE_SIZE = 2048
+QUANTILES = {'p01': 0.01, 'p25': 0.25, 'p50': 0.5, 'p75': 0.75, 'p99': 0.99}
+
+
+def _hll_update(registers, hashes):
+    """Atualiza os registradores HyperLogLog com hashes de 64 bits"""
+    index = (hashes >> np.uint64(HLL_VALUE_BITS)).astype(np.intp)
+    values = (hashes & np.uint64((1 << HLL_VALUE_BITS) - 1)).astype(np.float64)
+    # frexp devolve o número de bits significativos (0 para o valor 0)
+    _, bits = np.frexp(values)
+    ranks = (HLL_VALUE_BITS + 1 - bits).astype(np.uint8)
+    np.maximum.at(registers, index, ranks)
+
+
+def _hll_estimate(registers):
+    """Estimativa de distintos, com contagem linear em cardinalidades baixas"""
+    m = float(HLL_REGISTERS)
+    zeros = int((registers == 0).sum())
+    raw = (0.7213 / (1 + 1.079 / m)) * m * m / float(np.power(2.0, -registers.astype(np.float64)).sum())
+    if raw <= 2.5 * m and zeros:
+        return int(round(m * np.log(m / zeros)))
+    return int(round(raw))
+
+
+def _json_value(value):
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class DataProfiler:
+    """Perfil de qualidade dos datasets, calculado coluna a coluna de forma vetorizada
+
+    ``profile`` percorre cada coluna uma vez e devolve um perfil parcial:
+    nulos, sketch HyperLogLog de distintos, mínimo/máximo (números e datas),
+    amostra bottom-k para quantis e, apenas nas chaves declaradas em
+    ``KEY_COLUMNS``, a contagem exata de duplicatas. Perfis parciais (blocos ou
+    partições de processos diferentes) são combinados com ``merge`` e
+    convertidos no relatório compacto com ``report``.
+
+    Com ``sample_fraction`` < 1, os distintos e quantis são calculados sobre
+    uma amostra das linhas; nulos, extremos e duplicatas continuam exatos.
+    Para as colunas de ``value_columns`` o perfil guarda também os valores
+    distintos (usados em verificações de integridade referencial), fora do
+    relatório.
+    """
+
+    # Chaves declaradas de cada dataset, as únicas verificadas quanto a duplicatas
+    KEY_COLUMNS = {
+        'sales': ['sale_id'],
+        'customers': ['customer_id'],
+        'products': ['product_id'],
+    }
+
+    def __init__(self, sample_fraction=1.0, key_columns=None, value_columns=None, seed=None):
+        self.sample_fraction = sample_fraction
+        self.key_columns = key_columns or self.KEY_COLUMNS
+        self.value_columns = value_columns or {}
+        self.rng = np.random.default_rng(seed)
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def _hash(series):
+        return pd.util.hash_pandas_object(series, index=False).to_numpy()
+
+    def _profile_column(self, series, sample, sample_keys):
+        null_mask = series.isna().to_numpy()
+        column = {
+            'dtype': str(series.dtype),
+            'nulls': int(null_mask.sum()),
+            'registers': np.zeros(HLL_REGISTERS, dtype=np.uint8),
+        }
+
+        sampled = sample if sample is not None else slice(None)
+        present = series.iloc[sampled][~null_mask[sampled]]
+        if len(present):
+            _hll_update(column['registers'], self._hash(present))
+
+        dtype = series.dtype
+        numeric = pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+        if numeric or pd.api.types.is_datetime64_any_dtype(dtype):
+            column['min'] = series.min()
+            column['max'] = series.max()
+        if numeric:
+            candidates = sample_keys['positions']
+            keep = ~null_mask[candidates]
+            column['sample_keys'] = sample_keys['keys'][keep]
+            column['sample_values'] = series.to_numpy(dtype=np.float64, na_value=np.nan)[candidates[keep]]
+        return column
+
+    def profile(self, df, dataset_name):
+        """Perfil parcial (combinável) de um DataFrame"""
+        started = time.monotonic()
+        rows = len(df)
+
+        # Chaves aleatórias por linha: as menores formam a amostra bottom-k dos
+        # quantis, que continua uniforme quando perfis parciais são combinados
+        keys = self.rng.random(rows)
+        positions = (np.argpartition(keys, QUANTILE_SAMPLE_SIZE)[:QUANTILE_SAMPLE_SIZE]
+                     if rows > QUANTILE_SAMPLE_SIZE else np.arange(rows))
+        sample_keys = {'keys': keys[positions], 'positions': positions}
+        sample = np.flatnonzero(keys < self.sample_fraction) if self.sample_fraction < 1 else None
+
+        key_columns = [column for column in self.key_columns.get(dataset_name, []) if column in df.columns]
+        key_hashes = np.unique(self._hash(df[key_columns])) if key_columns else np.empty(0, dtype=np.uint64)
+
+        state = {
+            'dataset': dataset_name,
+            'rows': rows,
+            'profiled_rows': rows if sample is None else len(sample),
+            'key_columns': key_columns,
+            'key_hashes': key_hashes,
+            'duplicate_records': rows - len(key_hashes) if key_columns else 0,
+            'columns': {column: self._profile_column(df[column], sample, sample_keys)
+                        for column in df.columns},
+            'values': {column: df[column].dropna().unique()
+                       for column in self.value_columns.get(dataset_name, []) if column in df.columns},
+        }
+        state['profile_seconds'] = time.monotonic() - started
+        return state
+
+    def merge(self, states):
+        """Combina perfis parciais do mesmo dataset (contagens de ``rule_rejections`` são somadas)"""
+        states = [state for state in states if state]
+        if len(states) <= 1:
+            return states[0] if states else None
+
+        first = states[0]
+        key_hashes = np.concatenate([state['key_hashes'] for state in states])
+        unique_keys = np.unique(key_hashes)
+        merged = {
+            'dataset': first['dataset'],
+            'rows': sum(state['rows'] for state in states),
+            'profiled_rows': sum(state['profiled_rows'] for state in states),
+            'key_columns': first['key_columns'],
+            'key_hashes': unique_keys,
+            # Duplicatas dentro de cada parte mais as repetidas entre partes
+            'duplicate_records': (sum(state['duplicate_records'] for state in states)
+                                  + len(key_hashes) - len(unique_keys)),
+            'profile_seconds': sum(state['profile_seconds'] for state in states),
+            'columns': {},
+            'values': {column: pd.unique(np.concatenate([np.asarray(state['values'][column])
+                                                         for state in states]))
+                       for column in first['values']},
+        }
+        if any('rule_rejections' in state for state in states):
+            rejections = {}
+            for state in states:
+                for rule, count in state.get('rule_rejections', {}).items():
+                    rejections[rule] = rejections.get(rule, 0) + count
+            merged['rule_rejections'] = rejections
+
+        for name, column in first['columns'].items():
+            parts = [state['columns'][name] for state in states]
+            combined = {
+                'dtype': column['dtype'],
+                'nulls': sum(part['nulls'] for part in parts),
+                'registers': np.maximum.reduce([part['registers'] for part in parts]),
+            }
+            if 'min' in column:
+                combined['min'] = pd.Series([part['min'] for part in parts]).min()
+                combined['max'] = pd.Series([part['max'] for part in parts]).max()
+            if 'sample_keys' in column:
+                sample_keys = np.concatenate([part['sample_keys'] for part in parts])
+                sample_values = np.concatenate([part['sample_values'] for part in parts])
+                if len(sample_keys) > QUANTILE_SAMPLE_SIZE:
+                    keep = np.argpartition(sample_keys, QUANTILE_SAMPLE_SIZE)[:QUANTILE_SAMPLE_SIZE]
+                    sample_keys, sample_values = sample_keys[keep], sample_values[keep]
+                combined['sample_keys'] = sample_keys
+                combined['sample_values'] = sample_values
+            merged['columns'][name] = combined
+        return merged
+
+    def report(self, state, dataset_name=None):
+        """Relatório compacto e tipado (serializável em JSON) de um perfil"""
+        if not state:
+            return {'dataset': dataset_name, 'total_records': 0, 'total_columns': 0,
+                    'null_values': 0, 'key_columns': self.key_columns.get(dataset_name, []),
+                    'duplicate_records': 0, 'profiled_rows': 0,
+                    'validation_timestamp': datetime.now().isoformat(), 'columns': {}}
+
+        columns = {}
+        for name, column in state['columns'].items():
+            entry = {
+                'dtype': column['dtype'],
+                'nulls': column['nulls'],
+                'distinct': _hll_estimate(column['registers']),
+            }
+            if 'min' in column:
+                entry['min'] = _json_value(column['min'])
+                entry['max'] = _json_value(column['max'])
+            if 'sample_values' in column and len(column['sample_values']):
+                values = np.quantile(column['sample_values'], list(QUANTILES.values()))
+                entry['quantiles'] = {label: round(float(value), 4)
+                                      for label, value in zip(QUANTILES, values)}
+            columns[name] = entry
+
+        self.logger.info(f"Profiled {state['dataset']}: {state['rows']} records in "
+                         f"{state['profile_seconds']:.3f}s")
+        report = {
+            'dataset': state['dataset'],
+            'total_records': state['rows'],
+            'total_columns': len(columns),
+            'null_values': sum(column['nulls'] for column in columns.values()),
+            'key_columns': state['key_columns'],
+            'duplicate_records': state['duplicate_records'],
+            'profiled_rows': state['profiled_rows'],
+            'profile_seconds': round(state['profile_seconds'], 3),
+            'validation_timestamp': datetime.now().isoformat(),
+            'columns': columns
+        }
+        if 'rule_rejections' in state:
+            report['rule_rejections'] = state['rule_rejections']
+        return report
@@ -4,9 +4,92 @@ import logging
 from datetime import datetime
 import os
 import re
+import json
+
+from metrics.stage_metrics import get_metrics_recorder
+from storage.data_store import RunPartition, get_store
+from storage.stage_cache import get_stage_cache
+from transform.dtype_planner import DtypePlanner
+from transform.data_profiler import DataProfiler
+from transform.expectations import ExpectationSuite
+
+def _default_eval_engine():
+    try:
+        import numexpr  # noqa: F401
+        return 'numexpr'
+    except ImportError:
+        return 'python'
 
 class DataTransformer:
-    def __init__(self):
+    # Atributos versionados das dimensões (SCD tipo 2): a mudança de qualquer um
+    # deles gera uma nova versão da linha no warehouse
+    CUSTOMER_SCD_ATTRIBUTES = [
+        'customer_name', 'email', 'city', 'country',
+        'customer_segment', 'registration_date', 'is_valid_email'
+    ]
+    PRODUCT_SCD_ATTRIBUTES = [
+        'product_name', 'category', 'brand', 'unit_price', 'cost_price',
+        'profit_margin', 'margin_category', 'price_category'
+    ]
+    
+    # Colunas obrigatórias e regras de validação das vendas (expressões de
+    # DataFrame.eval que a linha precisa satisfazer para ser mantida)
+    SALES_CRITICAL_COLUMNS = ['sale_id', 'customer_id', 'product_id', 'total_amount']
+    SALES_RULES = {
+        'non_positive_total_amount': 'total_amount > 0',
+        'non_positive_quantity': 'quantity > 0',
+        'non_positive_unit_price': 'unit_price > 0',
+    }
+    # Métricas derivadas das vendas, calculadas em um único eval
+    SALES_DERIVED_COLUMNS = """
+    calculated_total = quantity * unit_price
+    price_variance = abs(total_amount - calculated_total)
+    is_discounted = price_variance > 0.01
+    """
+    
+    # Datasets transformados: nome -> (dataset bruto, dataset limpo, método de limpeza)
+    DATASETS = {
+        'sales': ('sales_data', 'sales_clean', 'clean_sales_data'),
+        'customers': ('customers_data', 'customers_clean', 'clean_customer_data'),
+        'products': ('products_data', 'products_clean', 'clean_product_data'),
+    }
+    
+    # Chaves dos resumos de vendas e como cada coluna parcial é combinada entre blocos
+    SUMMARY_KEYS = {
+        'product_summary': ['product_id', 'product_name', 'category'],
+        'customer_summary': ['customer_id', 'customer_name'],
+        'daily_summary': ['sale_date'],
+    }
+    SUMMARY_MERGE = {
+        'total_quantity': 'sum', 'total_revenue': 'sum', 'total_sales': 'sum',
+        'first_sale': 'min', 'last_sale': 'max',
+        'total_spent': 'sum', 'total_orders': 'sum',
+        'first_purchase': 'min', 'last_purchase': 'max',
+        'daily_revenue': 'sum', 'daily_orders': 'sum',
+    }
+    
+    # Configuração que altera as saídas (compõe a chave do cache de etapa) e
+    # relatórios gravados ao lado dos datasets processados
+    CACHE_CONFIG = ('ETL_STORAGE_FORMAT', 'ETL_PARQUET_COMPRESSION', 'TRANSFORM_CHUNK_SIZE',
+                    'TRANSFORM_WORKERS', 'TRANSFORM_EVAL_ENGINE', 'PROFILE_SAMPLE_FRACTION',
+                    'EXPECTATIONS_FILE')
+    REPORT_FILES = ('data_quality_report.json', 'memory_report.json', 'expectation_results.json')
+    
+    def __init__(self, eval_engine=None, expectation_store=None, datasets=None):
+        # numexpr (quando instalado) ou python para as expressões das regras
+        self.eval_engine = eval_engine or os.getenv('TRANSFORM_EVAL_ENGINE') or _default_eval_engine()
+        self.sales_rejections = {}
+        # Subconjunto dos datasets a transformar (ex.: só as vendas de uma fatia)
+        if datasets is not None:
+            self.DATASETS = {dataset_name: self.DATASETS[dataset_name] for dataset_name in datasets}
+        # Expectativas declarativas; as chaves e colunas referenciadas guiam o profiler
+        self.expectations = ExpectationSuite.load(store=expectation_store)
+        # Fração das linhas usada para distintos e quantis no perfil de qualidade
+        self.profiler = DataProfiler(
+            sample_fraction=float(os.getenv('PROFILE_SAMPLE_FRACTION', '1.0')),
+            key_columns=self.expectations.key_columns() or None,
+            value_columns=self.expectations.value_columns()
+        )
         self.setup_logging()
     
     def setup_logging(self):
@@ -14,65 +97,88 @@ class DataTransformer:
         self.logger = logging.getLogger(__name__)
     
     def clean_sales_data(self, sales_df):
-        """Limpa e transforma dados de vendas"""
+        """Limpa e transforma dados de vendas
+
+        As regras de SALES_RULES são avaliadas sobre o lote inteiro e combinadas
+        em uma única máscara; as colunas derivadas são calculadas em um único
+        eval. A contagem de rejeições por regra fica em ``sales_rejections``.
+        """
         self.logger.info("Starting sales data cleaning")
         
-        # Fazer cópia para não modificar o original
-        df = sales_df.copy()
-        
-        # Remover registros com valores nulos críticos
-        initial_count = len(df)
-        df = df.dropna(subset=['sale_id', 'customer_id', 'product_id', 'total_amount'])
-        self.logger.info(f"Removed {initial_count - len(df)} records with null critical values")
-        
         # Converter tipos de dados
-        df['sale_date'] = pd.to_datetime(df['sale_date'])
-        df['total_amount'] = pd.to_numeric(df['total_amount'], errors='coerce')
-        df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce')
-        df['unit_price'] = pd.to_numeric(df['unit_price'], errors='coerce')
-        
-        # Validar valores lógicos
-        df = df[df['total_amount'] > 0]
-        df = df[df['quantity'] > 0]
-        df = df[df['unit_price'] > 0]
+        df = sales_df.assign(
+            sale_date=pd.to_datetime(sales_df['sale_date']),
+            total_amount=pd.to_numeric(sales_df['total_amount'], errors='coerce'),
+            quantity=pd.to_numeric(sales_df['quantity'], errors='coerce'),
+            unit_price=pd.to_numeric(sales_df['unit_price'], errors='coerce')
+        )
+        
+        # Validar valores críticos e lógicos em uma única máscara
+        mask, self.sales_rejections = self.evaluate_rules(df, self.SALES_RULES,
+                                                          self.SALES_CRITICAL_COLUMNS)
+        df = df[mask]
+        self.logger.info(f"Rejected {len(mask) - len(df)} sales records: {self.sales_rejections}")
         
         # Calcular métricas derivadas
-        df['calculated_total'] = df['quantity'] * df['unit_price']
-        df['price_variance'] = abs(df['total_amount'] - df['calculated_total'])
-        df['is_discounted'] = df['price_variance'] > 0.01
-        
-        # Adicionar categorias de valor
-        df['sale_category'] = pd.cut(df['total_amount'], 
-                                   bins=[0, 100, 500, 1000, float('inf')],
-                                   labels=['Low', 'Medium', 'High', 'Premium'])
-        
-        # Adicionar informações temporais
-        df['year'] = df['sale_date'].dt.year
-        df['month'] = df['sale_date'].dt.month
-        df['day_of_week'] = df['sale_date'].dt.dayofweek
-        df['quarter'] = df['sale_date'].dt.quarter
+        df = df.eval(self.SALES_DERIVED_COLUMNS, engine=self.eval_engine)
+        
+        # Adicionar categorias de valor e informações temporais
+        sale_date = df['sale_date'].dt
+        df = df.assign(
+            sale_category=pd.cut(df['total_amount'],
+                                 bins=[0, 100, 500, 1000, float('inf')],
+                                 labels=['Low', 'Medium', 'High', 'Premium']),
+            year=sale_date.year,
+            month=sale_date.month,
+            day_of_week=sale_date.dayofweek,
+            quarter=sale_date.quarter
+        )
         
         self.logger.info(f"Sales data cleaning completed. Final count: {len(df)}")
         return df
     
+    def evaluate_rules(self, df, rules, required_columns=()):
+        """Avalia as regras de validação e devolve (máscara combinada, rejeições por regra)
+
+        Cada linha é mantida só se tiver ``required_columns`` preenchidas e
+        satisfizer todas as regras. Uma linha que viola várias regras conta na
+        rejeição de cada uma delas.
+        """
+        rejections = {}
+        mask = np.ones(len(df), dtype=bool)
+        
+        if required_columns:
+            rule_mask = df[list(required_columns)].notna().all(axis=1).to_numpy()
+            rejections['null_critical_values'] = int((~rule_mask).sum())
+            mask &= rule_mask
+        
+        for name, expression in rules.items():
+            rule_mask = df.eval(expression, engine=self.eval_engine).to_numpy(dtype=bool, na_value=False)
+            rejections[name] = int((~rule_mask).sum())
+            mask &= rule_mask
+        
+        return mask, rejections
+    
     def clean_customer_data(self, customers_df):
         """Limpa e transforma dados de clientes"""
         self.logger.info("Starting customer data cleaning")
         
-        df = customers_df.copy()
+        # Cópia rasa: as colunas são substituídas, nunca alteradas no lugar
+        df = customers_df.copy(deep=False)
         
         # Limpeza de email
         df['email'] = df['email'].str.lower().str.strip()
         email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
         df['is_valid_email'] = df['email'].str.match(email_pattern, na=False)
         
-        # Limpeza de telefone
-        df['phone'] = df['phone'].astype(str).str.replace(r'[^\d]', '', regex=True)
+        # Limpeza de telefone (ausentes viram '', como com astype(str): dim_customer
+        # continua recebendo os mesmos valores)
+        df['phone'] = df['phone'].astype('string').str.replace(r'[^\d]', '', regex=True).fillna('')
         
         # Padronização de nomes
         df['customer_name'] = df['customer_name'].str.title().str.strip()
-        df['city'] = df['city'].str.title().str.strip()
-        df['country'] = df['country'].str.upper().str.strip()
+        df['city'] = self.map_text(df['city'], lambda text: text.str.title().str.strip())
+        df['country'] = self.map_text(df['country'], lambda text: text.str.upper().str.strip())
         
         # Converter datas
         df['registration_date'] = pd.to_datetime(df['registration_date'])
@@ -84,10 +190,15 @@ class DataTransformer:
         df['days_since_last_purchase'] = (current_date - df['last_purchase_date']).dt.days
         
         # Categorizar clientes por recência
-        df['customer_segment'] = 'Inactive'
-        df.loc[df['days_since_last_purchase'] <= 30, 'customer_segment'] = 'Active'
-        df.loc[df['days_since_last_purchase'] <= 7, 'customer_segment'] = 'Highly Active'
-        df.loc[df['days_since_last_purchase'] > 365, 'customer_segment'] = 'Churned'
+        days = df['days_since_last_purchase']
+        df['customer_segment'] = pd.Categorical(
+            np.select([days <= 7, days <= 30, days > 365],
+                      ['Highly Active', 'Active', 'Churned'], default='Inactive'),
+            categories=['Highly Active', 'Active', 'Inactive', 'Churned']
+        )
+        
+        # Hash dos atributos para detecção de mudanças na dimensão
+        df['attribute_hash'] = self.compute_attribute_hash(df, self.CUSTOMER_SCD_ATTRIBUTES)
         
         self.logger.info(f"Customer data cleaning completed. Final count: {len(df)}")
         return df
@@ -96,12 +207,12 @@ class DataTransformer:
         """Limpa e transforma dados de produtos"""
         self.logger.info("Starting product data cleaning")
         
-        df = products_df.copy()
+        df = products_df.copy(deep=False)
         
         # Padronização de texto
         df['product_name'] = df['product_name'].str.title().str.strip()
-        df['category'] = df['category'].str.title().str.strip()
-        df['brand'] = df['brand'].str.title().str.strip()
+        df['category'] = self.map_text(df['category'], lambda text: text.str.title().str.strip())
+        df['brand'] = self.map_text(df['brand'], lambda text: text.str.title().str.strip())
         
         # Converter preços
         df['unit_price'] = pd.to_numeric(df['unit_price'], errors='coerce')
@@ -111,115 +222,341 @@ class DataTransformer:
         df['profit_margin'] = ((df['unit_price'] - df['cost_price']) / df['unit_price'] * 100).round(2)
         
         # Categorizar por margem
-        df['margin_category'] = 'Low'
-        df.loc[df['profit_margin'] >= 20, 'margin_category'] = 'Medium'
-        df.loc[df['profit_margin'] >= 40, 'margin_category'] = 'High'
+        df['margin_category'] = pd.Categorical(
+            np.select([df['profit_margin'] >= 40, df['profit_margin'] >= 20],
+                      ['High', 'Medium'], default='Low'),
+            categories=['Low', 'Medium', 'High']
+        )
         
         # Categorizar por preço
         df['price_category'] = pd.cut(df['unit_price'], 
                                     bins=[0, 50, 200, 500, float('inf')],
                                     labels=['Budget', 'Mid-Range', 'Premium', 'Luxury'])
         
+        # Hash dos atributos para detecção de mudanças na dimensão
+        df['attribute_hash'] = self.compute_attribute_hash(df, self.PRODUCT_SCD_ATTRIBUTES)
+        
         self.logger.info(f"Product data cleaning completed. Final count: {len(df)}")
         return df
     
+    def map_text(self, series, transform):
+        """Aplica uma transformação de texto (``.str``) preservando categorias
+
+        Em colunas categóricas a transformação roda só sobre as categorias
+        distintas, e não sobre cada linha.
+        """
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            return transform(series)
+        
+        categories = series.cat.categories
+        mapped = transform(pd.Series(categories, dtype=categories.dtype))
+        return series.map(dict(zip(categories, mapped))).astype('category')
+    
+    def compute_attribute_hash(self, df, columns):
+        """Calcula um hash de 64 bits por linha sobre as colunas informadas
+
+        Os valores são convertidos para texto antes do hash, de modo que o
+        resultado não dependa do dtype com que o dataset foi lido (Parquet ou CSV).
+        O resultado é um int64 com sinal, compatível com BIGINT.
+        """
+        hashes = pd.util.hash_pandas_object(df[columns].astype('string'), index=False)
+        return pd.Series(hashes.to_numpy().view('int64'), index=df.index)
+    
+    def partial_sales_summary(self, sales_df):
+        """Calcula os resumos de vendas como agregados parciais (somas, contagens,
+        mínimos e máximos), que podem ser combinados entre blocos de linhas"""
+        product_summary = sales_df.groupby(self.SUMMARY_KEYS['product_summary'], observed=True).agg(
+            total_quantity=('quantity', 'sum'),
+            total_revenue=('total_amount', 'sum'),
+            total_sales=('total_amount', 'count'),
+            first_sale=('sale_date', 'min'),
+            last_sale=('sale_date', 'max')
+        ).reset_index()
+        
+        customer_summary = sales_df.groupby(self.SUMMARY_KEYS['customer_summary'], observed=True).agg(
+            total_spent=('total_amount', 'sum'),
+            total_orders=('total_amount', 'count'),
+            first_purchase=('sale_date', 'min'),
+            last_purchase=('sale_date', 'max')
+        ).reset_index()
+        
+        daily_summary = sales_df.groupby(sales_df['sale_date'].dt.date).agg(
+            daily_revenue=('total_amount', 'sum'),
+            daily_orders=('sale_id', 'count')
+        ).reset_index()
+        
+        return {
+            'product_summary': product_summary,
+            'customer_summary': customer_summary,
+            'daily_summary': daily_summary
+        }
+    
+    def merge_sales_summaries(self, partials):
+        """Combina agregados parciais (lista de saídas de partial_sales_summary)"""
+        merged = {}
+        for name, keys in self.SUMMARY_KEYS.items():
+            frames = [partial[name] for partial in partials if len(partial[name])]
+            if not frames:
+                merged[name] = partials[0][name] if partials else pd.DataFrame()
+                continue
+            
+            combined = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+            functions = {column: self.SUMMARY_MERGE[column]
+                         for column in combined.columns if column not in keys}
+            merged[name] = combined.groupby(keys, observed=True).agg(functions).reset_index()
+        return merged
+    
+    def finalize_sales_summary(self, partials):
+        """Transforma agregados parciais combinados nos resumos finais (médias e arredondamento)"""
+        product_summary = partials['product_summary']
+        product_summary = product_summary.assign(
+            total_revenue=product_summary['total_revenue'].round(2),
+            avg_sale_value=(product_summary['total_revenue'] / product_summary['total_sales']).round(2)
+        )[self.SUMMARY_KEYS['product_summary'] + [
+            'total_quantity', 'total_revenue', 'avg_sale_value', 'total_sales', 'first_sale', 'last_sale'
+        ]]
+        
+        customer_summary = partials['customer_summary']
+        customer_summary = customer_summary.assign(
+            total_spent=customer_summary['total_spent'].round(2),
+            avg_order_value=(customer_summary['total_spent'] / customer_summary['total_orders']).round(2)
+        )[self.SUMMARY_KEYS['customer_summary'] + [
+            'total_spent', 'avg_order_value', 'total_orders', 'first_purchase', 'last_purchase'
+        ]]
+        
+        daily_summary = partials['daily_summary']
+        daily_summary = daily_summary.assign(daily_revenue=daily_summary['daily_revenue'].round(2))
+        
+        return product_summary, customer_summary, daily_summary
+    
     def create_sales_summary(self, sales_df):
         """Cria resumo agregado de vendas"""
         self.logger.info("Creating sales summary")
-        
-        # Resumo por produto
-        product_summary = sales_df.groupby(['product_id', 'product_name', 'category']).agg({
-            'quantity': 'sum',
-            'total_amount': ['sum', 'mean', 'count'],
-            'sale_date': ['min', 'max']
-        }).round(2)
-        
-        product_summary.columns = ['total_quantity', 'total_revenue', 'avg_sale_value', 
-                                 'total_sales', 'first_sale', 'last_sale']
-        product_summary = product_summary.reset_index()
-        
-        # Resumo por cliente
-        customer_summary = sales_df.groupby(['customer_id', 'customer_name']).agg({
-            'total_amount': ['sum', 'mean', 'count'],
-            'sale_date': ['min', 'max']
-        }).round(2)
-        
-        customer_summary.columns = ['total_spent', 'avg_order_value', 'total_orders',
-                                   'first_purchase', 'last_purchase']
-        customer_summary = customer_summary.reset_index()
-        
-        # Resumo temporal
-        daily_summary = sales_df.groupby(sales_df['sale_date'].dt.date).agg({
-            'total_amount': 'sum',
-            'sale_id': 'count'
-        }).round(2)
-        
-        daily_summary.columns = ['daily_revenue', 'daily_orders']
-        daily_summary = daily_summary.reset_index()
-        
+        summaries = self.finalize_sales_summary(self.partial_sales_summary(sales_df))
         self.logger.info("Sales summary creation completed")
-        return product_summary, customer_summary, daily_summary
+        return summaries
     
-    def validate_data_quality(self, df, dataset_name):
-        """Valida qualidade dos dados"""
-        self.logger.info(f"Validating data quality for {dataset_name}")
-        
-        quality_report = {
-            'dataset': dataset_name,
-            'total_records': len(df),
-            'total_columns': len(df.columns),
-            'null_values': df.isnull().sum().sum(),
-            'duplicate_records': df.duplicated().sum(),
-            'validation_timestamp': datetime.now().isoformat()
-        }
-        
-        # Calcular porcentagem de completude por coluna
-        completeness = ((len(df) - df.isnull().sum()) / len(df) * 100).round(2)
-        quality_report['column_completeness'] = completeness.to_dict()
-        
-        self.logger.info(f"Data quality validation completed for {dataset_name}")
-        return quality_report
+    def transform_chunks(self, dataset_name, chunks, processed_store, planner, clean_name=None):
+        """Limpa os blocos de um dataset bruto, gravando o resultado incrementalmente
+
+        Só um bloco fica em memória por vez. Nas vendas, os resumos são mantidos
+        como agregados parciais, combinados a cada bloco. Retorna (perfil de
+        qualidade combinado dos blocos, agregados parciais das vendas ou None).
+        """
+        raw_name, default_clean_name, clean_method = self.DATASETS[dataset_name]
+        clean_name = clean_name or default_clean_name
+        clean = getattr(self, clean_method)
+        is_sales = dataset_name == 'sales'
+        summary = {}
+        profile = None
+        chunk_count = 0
+        
+        with processed_store.open_writer(clean_name) as writer:
+            for chunk in chunks:
+                clean_chunk = clean(planner.apply(chunk, raw_name))
+                writer.write(clean_chunk)
+                profile = self.profiler.merge([profile, self.profile(clean_chunk, dataset_name)])
+                chunk_count += 1
+                
+                if is_sales:
+                    partials = [self.partial_sales_summary(clean_chunk)]
+                    if summary:
+                        partials.insert(0, summary)
+                    summary = self.merge_sales_summaries(partials)
+        
+        self.logger.info(f"{clean_name}: {writer.rows} records transformed in {chunk_count} chunks")
+        return profile, summary if is_sales else None
+    
+    def write_sales_summary(self, summary, raw_store, processed_store):
+        """Finaliza os agregados parciais combinados e grava os resumos de vendas"""
+        if not summary:
+            # Sem vendas: resumos vazios, com as colunas esperadas
+            empty_sales = self.clean_sales_data(raw_store.read('sales_data'))
+            summary = self.partial_sales_summary(empty_sales)
+        
+        product_summary, customer_summary, daily_summary = self.finalize_sales_summary(summary)
+        processed_store.write(product_summary, 'product_summary')
+        processed_store.write(customer_summary, 'customer_summary')
+        processed_store.write(daily_summary, 'daily_summary')
+    
+    def transform_chunked(self, raw_store, processed_store, planner, chunk_size):
+        """Executa a transformação em blocos de ``chunk_size`` linhas
 
-def main():
-    transformer = DataTransformer()
+        As limpezas são locais a cada linha e rodam bloco a bloco, de modo que a
+        memória fica limitada pelo tamanho do bloco (e pelo número de grupos dos
+        resumos). Retorna os perfis de qualidade de cada dataset.
+        """
+        profiles = {}
+        summary = None
+        for dataset_name, (raw_name, _, _) in self.DATASETS.items():
+            profile, partials = self.transform_chunks(
+                dataset_name, raw_store.iter_chunks(raw_name, chunk_size), processed_store, planner
+            )
+            profiles[dataset_name] = profile
+            summary = partials if dataset_name == 'sales' else summary
+        
+        if 'sales' in self.DATASETS:
+            self.write_sales_summary(summary, raw_store, processed_store)
+        return profiles
+    
+    def cache_key(self, stage_cache, raw_store):
+        """Chave da transformação no cache de etapa
+
+        Combina o conteúdo dos datasets brutos, o código da transformação e do
+        armazenamento, as expectativas e a configuração de CACHE_CONFIG. A data
+        corrente também entra: a segmentação de clientes depende dela.
+        """
+        etl_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        code = [os.path.join(etl_dir, 'transform'), os.path.join(etl_dir, 'storage')]
+        if os.getenv('EXPECTATIONS_FILE'):
+            code.append(os.getenv('EXPECTATIONS_FILE'))
+        config = {name: os.getenv(name) for name in self.CACHE_CONFIG}
+        config['as_of'] = datetime.now().date().isoformat()
+        inputs = [raw_store.path(raw_name) for raw_name, _, _ in self.DATASETS.values()]
+        return stage_cache.fingerprint('transform', inputs, code, config)
+    
+    def output_paths(self, processed_store):
+        """Arquivos produzidos pela transformação (datasets limpos, resumos e relatórios)"""
+        names = [clean_name for _, clean_name, _ in self.DATASETS.values()]
+        names += list(self.SUMMARY_KEYS) if 'sales' in self.DATASETS else []
+        return ([processed_store.path(name) for name in names]
+                + [os.path.join(processed_store.base_dir, file_name) for file_name in self.REPORT_FILES])
+    
+    def record_outputs(self, stage_metrics, processed_store):
+        """Linhas e bytes dos datasets limpos nas métricas da etapa"""
+        for _, clean_name, _ in self.DATASETS.values():
+            if processed_store.exists(clean_name):
+                stage_metrics.add_output(rows=processed_store.row_count(clean_name),
+                                         bytes_written=processed_store.size(clean_name))
+    
+    def record_cached_expectations(self, processed_store):
+        """Registra no histórico de expectativas uma execução restaurada do cache
+
+        Relatórios e resultados vêm dos arquivos restaurados; as chaves
+        referenciadas são lidas dos datasets limpos, para que o histórico e as
+        chaves conhecidas continuem avançando mesmo sem reprocessar.
+        """
+        with open(os.path.join(processed_store.base_dir, 'data_quality_report.json')) as f:
+            reports = {report['dataset']: report for report in json.load(f)}
+        with open(os.path.join(processed_store.base_dir, 'expectation_results.json')) as f:
+            results = json.load(f)
+        value_columns = self.expectations.value_columns()
+        profiles = {}
+        for dataset_name, (_, clean_name, _) in self.DATASETS.items():
+            columns = value_columns.get(dataset_name)
+            if columns and processed_store.exists(clean_name):
+                df = processed_store.read(clean_name)
+                profiles[dataset_name] = {'values': {column: df[column].dropna().unique()
+                                                     for column in columns if column in df.columns}}
+        self.expectations.record(results, reports, profiles)
+
+    def profile(self, df, dataset_name):
+        """Perfil de qualidade (combinável) de um dataset limpo
+
+        Nas vendas o perfil leva as rejeições por regra da última limpeza.
+        """
+        profile = self.profiler.profile(df, dataset_name)
+        if dataset_name == 'sales':
+            profile['rule_rejections'] = dict(self.sales_rejections)
+        return profile
+
+def main(partition=None, datasets=None):
+    """Executa a transformação dos datasets brutos da execução
+
+    ``datasets`` restringe os datasets transformados (ex.: só ``sales`` em
+    uma fatia da janela; padrão: todos os de DataTransformer.DATASETS).
+    """
+    transformer = DataTransformer(expectation_store=get_store('quality'), datasets=datasets)
+    planner = DtypePlanner()
+    
+    # Datasets no diretório da execução (RunPartition, padrão: ETL_LOGICAL_DATE)
+    partition = partition or RunPartition.from_env()
+    raw_store = get_store('raw', partition=partition)
+    processed_store = get_store('processed', partition=partition)
+    
+    # TRANSFORM_CHUNK_SIZE > 0 processa os datasets em blocos, com memória limitada;
+    # TRANSFORM_WORKERS > 1 (ou 0 = todos os núcleos) distribui partições entre processos
+    chunk_size = int(os.getenv('TRANSFORM_CHUNK_SIZE', '0'))
+    workers = int(os.getenv('TRANSFORM_WORKERS', '1'))
+    
+    # Métricas da etapa (duração, linhas, bytes e memória): ETL_METRICS_EXPORTER
+    metrics = get_metrics_recorder(partition)
+    stage = metrics.start('transform', '+'.join(transformer.DATASETS))
     
     try:
-        # Carregar dados brutos
-        sales_df = pd.read_csv('/opt/airflow/data/raw/sales_data.csv')
-        customers_df = pd.read_csv('/opt/airflow/data/raw/customers_data.csv')
-        products_df = pd.read_csv('/opt/airflow/data/raw/products_data.csv')
-        
-        # Transformar dados
-        clean_sales = transformer.clean_sales_data(sales_df)
-        clean_customers = transformer.clean_customer_data(customers_df)
-        clean_products = transformer.clean_product_data(products_df)
-        
-        # Criar resumos
-        product_summary, customer_summary, daily_summary = transformer.create_sales_summary(clean_sales)
-        
-        # Validar qualidade
-        sales_quality = transformer.validate_data_quality(clean_sales, 'sales')
-        customers_quality = transformer.validate_data_quality(clean_customers, 'customers')
-        products_quality = transformer.validate_data_quality(clean_products, 'products')
-        
-        # Salvar dados transformados
-        clean_sales.to_csv('/opt/airflow/data/processed/sales_clean.csv', index=False)
-        clean_customers.to_csv('/opt/airflow/data/processed/customers_clean.csv', index=False)
-        clean_products.to_csv('/opt/airflow/data/processed/products_clean.csv', index=False)
-        
-        # Salvar resumos
-        product_summary.to_csv('/opt/airflow/data/processed/product_summary.csv', index=False)
-        customer_summary.to_csv('/opt/airflow/data/processed/customer_summary.csv', index=False)
-        daily_summary.to_csv('/opt/airflow/data/processed/daily_summary.csv', index=False)
+        for raw_name, _, _ in transformer.DATASETS.values():
+            stage.add_input(rows=raw_store.row_count(raw_name), bytes_read=raw_store.size(raw_name))
+        
+        # Cache de etapa (STAGE_CACHE=false desativa): com as mesmas entradas, código
+        # e configuração, as saídas da execução anterior são restauradas sem reprocessar
+        stage_cache = get_stage_cache()
+        if stage_cache:
+            cache_key = transformer.cache_key(stage_cache, raw_store)
+            manifest = stage_cache.lookup('transform', cache_key)
+            if manifest:
+                stage_cache.restore(manifest, processed_store.base_dir)
+                # Lotes em cache já foram aprovados: o histórico também registra a execução
+                transformer.record_cached_expectations(processed_store)
+                transformer.record_outputs(stage, processed_store)
+                metrics.finish(stage, 'CACHED')
+                transformer.logger.info("Data transformation skipped: outputs restored from stage cache")
+                return
+        
+        if workers != 1:
+            from transform.parallel_executor import ParallelTransformExecutor
+            
+            executor = ParallelTransformExecutor(transformer, planner, workers=workers or None,
+                                                 chunk_size=chunk_size or 100000)
+            profiles = executor.run(raw_store, processed_store)
+        elif chunk_size > 0:
+            transformer.logger.info(f"Running chunked transform ({chunk_size} rows per chunk)")
+            profiles = transformer.transform_chunked(raw_store, processed_store, planner, chunk_size)
+        else:
+            profiles = {}
+            for dataset_name, (raw_name, clean_name, clean_method) in transformer.DATASETS.items():
+                # Carregar dados brutos já com dtypes econômicos (categorias, strings Arrow, inteiros reduzidos)
+                raw_df = planner.apply(raw_store.read(raw_name), raw_name)
+                
+                # Transformar, perfilar e salvar o dataset limpo
+                clean_df = getattr(transformer, clean_method)(raw_df)
+                profiles[dataset_name] = transformer.profile(clean_df, dataset_name)
+                processed_store.write(clean_df, clean_name)
+                
+                # Criar e salvar resumos de vendas
+                if dataset_name == 'sales':
+                    product_summary, customer_summary, daily_summary = transformer.create_sales_summary(clean_df)
+                    processed_store.write(product_summary, 'product_summary')
+                    processed_store.write(customer_summary, 'customer_summary')
+                    processed_store.write(daily_summary, 'daily_summary')
         
         # Salvar relatórios de qualidade
-        import json
-        with open('/opt/airflow/data/processed/data_quality_report.json', 'w') as f:
-            json.dump([sales_quality, customers_quality, products_quality], f, indent=2)
-        
+        reports = {dataset_name: transformer.profiler.report(profiles.get(dataset_name), dataset_name)
+                   for dataset_name in transformer.DATASETS}
+        with open(os.path.join(processed_store.base_dir, 'data_quality_report.json'), 'w') as f:
+            json.dump(list(reports.values()), f, indent=2)
+        
+        # Salvar relatório de memória (antes/depois do planejamento de dtypes)
+        with open(os.path.join(processed_store.base_dir, 'memory_report.json'), 'w') as f:
+            json.dump(planner.memory_report, f, indent=2)
+        
+        # Avaliar as expectativas: lotes reprovados param aqui, antes da carga
+        expectations = transformer.expectations
+        results = expectations.evaluate(reports, profiles)
+        with open(os.path.join(processed_store.base_dir, 'expectation_results.json'), 'w') as f:
+            json.dump(results, f, indent=2, default=str)
+        expectations.record(results, reports, profiles)
+        expectations.enforce(results)
+        
+        # Apenas lotes aprovados entram no cache
+        if stage_cache:
+            stage_cache.store('transform', cache_key, transformer.output_paths(processed_store))
+        
+        transformer.record_outputs(stage, processed_store)
+        metrics.finish(stage)
         transformer.logger.info("Data transformation completed successfully")
         
     except Exception as e:
+        metrics.finish(stage, 'FAILED', str(e))
         transformer.logger.error(f"Data transformation failed: {str(e)}")
         raise
 
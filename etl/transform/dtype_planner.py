@@ -0,0 +1,130 @@
+import pandas as pd
+import logging
+
+# Strings em Arrow: buffers contíguos em vez de um objeto Python por valor
+STRING_DTYPE = 'string[pyarrow]'
+
+
+class DtypePlanner:
+    """Define dtypes econômicos para os datasets brutos logo após a leitura
+
+    Cada dataset tem um schema declarado (coluna -> tipo lógico):
+
+    - ``category``: texto de baixa cardinalidade (cidade, país, categoria, ...)
+    - ``string``: texto de alta cardinalidade, em strings Arrow
+    - ``integer``: inteiros reduzidos ao menor tipo que comporta os valores
+    - qualquer outro valor é usado como dtype do pandas (ex.: ``float64``)
+
+    Colunas fora do schema seguem a regra geral: texto com poucos valores
+    distintos vira categoria, o restante vira string Arrow, e inteiros são
+    reduzidos. Valores monetários ficam em float64 para não perder precisão.
+    """
+
+    SCHEMAS = {
+        'sales_data': {
+            'sale_id': 'integer',
+            'customer_id': 'integer',
+            'product_id': 'integer',
+            'quantity': 'integer',
+            'unit_price': 'float64',
+            'total_amount': 'float64',
+            # Repetem-se a cada venda do mesmo cliente/produto
+            'customer_name': 'category',
+            'email': 'category',
+            'city': 'category',
+            'country': 'category',
+            'product_name': 'category',
+            'category': 'category',
+            'brand': 'category',
+        },
+        'customers_data': {
+            'customer_id': 'integer',
+            'customer_name': 'string',
+            'email': 'string',
+            'phone': 'string',
+            'address': 'string',
+            'city': 'category',
+            'country': 'category',
+            'total_purchases': 'integer',
+            'customer_status': 'category',
+        },
+        'products_data': {
+            'product_id': 'integer',
+            'product_name': 'string',
+            'category': 'category',
+            'brand': 'category',
+            'unit_price': 'float64',
+            'cost_price': 'float64',
+            'stock_quantity': 'integer',
+            'supplier_id': 'category',
+            'product_status': 'category',
+        },
+    }
+
+    # Fração máxima de valores distintos para texto fora do schema virar categoria
+    CATEGORY_MAX_RATIO = 0.5
+
+    def __init__(self, schemas=None):
+        self.schemas = schemas or self.SCHEMAS
+        self.memory_report = []
+        self.logger = logging.getLogger(__name__)
+
+    def _infer(self, series):
+        if pd.api.types.is_integer_dtype(series.dtype):
+            return 'integer'
+        if series.dtype == object:
+            distinct = series.nunique(dropna=True)
+            if len(series) and distinct / len(series) <= self.CATEGORY_MAX_RATIO:
+                return 'category'
+            return 'string'
+        return None
+
+    def _convert(self, series, kind):
+        if kind == 'integer':
+            if series.isna().any():
+                return series
+            return pd.to_numeric(series, downcast='integer')
+        if kind == 'string':
+            return series.astype(STRING_DTYPE)
+        return series.astype(kind)
+
+    def plan(self, df, dataset_name):
+        """Retorna o dtype planejado de cada coluna do DataFrame"""
+        schema = self.schemas.get(dataset_name, {})
+        plan = {}
+        for column in df.columns:
+            kind = schema.get(column) or self._infer(df[column])
+            if kind:
+                plan[column] = kind
+        return plan
+
+    def apply(self, df, dataset_name):
+        """Converte as colunas conforme o plano e registra a memória antes/depois"""
+        memory_before = int(df.memory_usage(deep=True).sum())
+        converted = {column: self._convert(df[column], kind)
+                     for column, kind in self.plan(df, dataset_name).items()}
+        df = df.assign(**converted)
+        memory_after = int(df.memory_usage(deep=True).sum())
+
+        self._record(dataset_name, len(df), memory_before, memory_after)
+        self.logger.info(f"{dataset_name}: memory {memory_before / 1024:.1f} KiB -> "
+                         f"{memory_after / 1024:.1f} KiB")
+        return df
+
+    def _record(self, dataset_name, rows, memory_before, memory_after):
+        # Em execuções por blocos (ou partições), os blocos do mesmo dataset são somados
+        entry = next((entry for entry in self.memory_report if entry['dataset'] == dataset_name), None)
+        if entry is None:
+            entry = {'dataset': dataset_name, 'rows': 0, 'memory_before_bytes': 0, 'memory_after_bytes': 0}
+            self.memory_report.append(entry)
+        entry['rows'] += rows
+        entry['memory_before_bytes'] += memory_before
+        entry['memory_after_bytes'] += memory_after
+        entry['reduction_ratio'] = (round(entry['memory_before_bytes'] / entry['memory_after_bytes'], 2)
+                                    if entry['memory_after_bytes'] else None)
+
+    def merge_report(self, memory_report):
+        """Soma ao relatório o relatório de memória de outro planejador (ex.: de um processo)"""
+        for entry in memory_report:
+            self._record(entry['dataset'], entry['rows'], entry['memory_before_bytes'],
+                         entry['memory_after_bytes'])
@@ -0,0 +1,280 @@
+import pandas as pd
+import numpy as np
+import json
+import logging
+import os
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem flock, o histórico não é protegido entre processos
+    fcntl = None
+
+DEFAULT_EXPECTATIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'expectations.json')
+HISTORY_FILE = 'expectation_history.jsonl'
+LOCK_FILE = '.expectations.lock'
+
+
+class ExpectationError(ValueError):
+    """Expectativas com severidade ``error`` falharam"""
+
+
+class ExpectationSuite:
+    """Expectativas declarativas por dataset, avaliadas sobre os perfis de qualidade
+
+    O arquivo JSON (EXPECTATIONS_FILE ou ``expectations.json`` ao lado deste
+    módulo) lista as regras de cada dataset:
+
+    - ``row_count``: limites ``min``/``max`` de registros e variação máxima
+      (``max_ratio``, para mais ou para menos) em relação à execução anterior
+    - ``unique``: colunas que identificam a linha (sem duplicatas)
+    - ``not_null``: fração máxima de nulos (``max_ratio``, padrão 0) das colunas
+    - ``range``: limites ``min``/``max`` de uma coluna (números ou datas ISO)
+    - ``reference``: valores de ``column`` que devem existir em ``key`` de outro
+      ``dataset``, no lote atual ou em lotes anteriores aprovados
+
+    Cada regra tem severidade ``error`` (padrão, interrompe o pipeline) ou
+    ``warn``. A avaliação usa apenas os perfis já calculados na transformação
+    (contagens, extremos, duplicatas e valores distintos das chaves), sem nova
+    passada sobre os dados. O histórico das execuções e as chaves já vistas
+    ficam no armazenamento informado (zona ``quality``).
+    """
+
+    def __init__(self, expectations, store=None):
+        self.expectations = expectations
+        self.store = store
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def load(cls, path=None, store=None):
+        path = path or os.getenv('EXPECTATIONS_FILE') or DEFAULT_EXPECTATIONS_PATH
+        with open(path) as f:
+            return cls(json.load(f), store)
+
+    def rules(self, dataset_name, rule_type):
+        return [rule for rule in self.expectations.get(dataset_name, []) if rule['rule'] == rule_type]
+
+    def key_columns(self):
+        """Colunas de unicidade de cada dataset (chaves declaradas para o profiler)"""
+        return {dataset_name: self.rules(dataset_name, 'unique')[0]['columns']
+                for dataset_name in self.expectations if self.rules(dataset_name, 'unique')}
+
+    def value_columns(self):
+        """Colunas cujos valores distintos o profiler deve guardar (integridade referencial)"""
+        columns = {}
+        for dataset_name in self.expectations:
+            for rule in self.rules(dataset_name, 'reference'):
+                columns.setdefault(dataset_name, []).append(rule['column'])
+                columns.setdefault(rule['dataset'], []).append(rule['key'])
+        return columns
+
+    def _history_path(self):
+        return os.path.join(self.store.base_dir, HISTORY_FILE)
+
+    def previous_run(self):
+        """Última execução aprovada registrada no histórico (ou None)"""
+        if self.store is None or not os.path.exists(self._history_path()):
+            return None
+        last = None
+        with open(self._history_path()) as f:
+            for line in f:
+                if line.strip():
+                    run = json.loads(line)
+                    last = run if run['passed'] else last
+        return last
+
+    def _known_name(self, dataset_name, key):
+        return f"known_{dataset_name}_{key}"
+
+    def known_values(self, dataset_name, key):
+        """Chaves aprovadas em execuções anteriores (None se ainda não há histórico)"""
+        name = self._known_name(dataset_name, key)
+        if self.store is None or not self.store.exists(name):
+            return None
+        return self.store.read(name)[key].to_numpy()
+
+    @staticmethod
+    def _result(dataset_name, rule, passed, observed, column=None, severity=None):
+        return {
+            'dataset': dataset_name,
+            'rule': rule['rule'],
+            'column': column,
+            'severity': severity or rule.get('severity', 'error'),
+            'passed': bool(passed),
+            'observed': observed,
+            'expected': {key: value for key, value in rule.items()
+                         if key not in ('rule', 'severity', 'column', 'columns')}
+        }
+
+    @staticmethod
+    def _bound(value, bound):
+        # Datas (ISO) no relatório e nas regras são comparadas como Timestamp
+        if isinstance(bound, str):
+            return pd.Timestamp(value), pd.Timestamp(bound)
+        return value, bound
+
+    def _check_row_count(self, dataset_name, rule, report, previous):
+        rows = report['total_records']
+        previous_rows = (previous or {}).get('datasets', {}).get(dataset_name, {}).get('rows')
+        passed = rule.get('min', 0) <= rows <= rule.get('max', float('inf'))
+        if rule.get('max_ratio') and previous_rows:
+            ratio = rows / previous_rows
+            passed = passed and 1 / rule['max_ratio'] <= ratio <= rule['max_ratio']
+        return [self._result(dataset_name, rule, passed, {'rows': rows, 'previous_rows': previous_rows})]
+
+    def _check_unique(self, dataset_name, rule, report):
+        column = ','.join(rule['columns'])
+        if report['key_columns'] != rule['columns']:
+            return [self._result(dataset_name, rule, report['total_records'] == 0,
+                                 'columns not profiled as key', column)]
+        duplicates = report['duplicate_records']
+        return [self._result(dataset_name, rule, duplicates == 0, {'duplicates': duplicates}, column)]
+
+    def _check_not_null(self, dataset_name, rule, report):
+        results = []
+        rows = report['total_records']
+        for column in rule['columns']:
+            profile = report['columns'].get(column)
+            if profile is None:
+                # Lote vazio (ex.: nenhuma venda nova) não tem perfil de colunas
+                results.append(self._result(dataset_name, rule, rows == 0, 'missing column', column))
+                continue
+            ratio = profile['nulls'] / rows if rows else 0.0
+            results.append(self._result(dataset_name, rule, ratio <= rule.get('max_ratio', 0),
+                                        {'nulls': profile['nulls'], 'ratio': round(ratio, 4)}, column))
+        return results
+
+    def _check_range(self, dataset_name, rule, report):
+        column = rule['column']
+        profile = report['columns'].get(column)
+        if profile is None or 'min' not in profile:
+            return [self._result(dataset_name, rule, report['total_records'] == 0, 'missing column', column)]
+
+        passed = True
+        if profile['min'] is not None and 'min' in rule:
+            observed, bound = self._bound(profile['min'], rule['min'])
+            passed = observed >= bound
+        if profile['max'] is not None and 'max' in rule:
+            observed, bound = self._bound(profile['max'], rule['max'])
+            passed = passed and observed <= bound
+        return [self._result(dataset_name, rule, passed, {'min': profile['min'], 'max': profile['max']}, column)]
+
+    def _check_reference(self, dataset_name, rule, profiles):
+        column = rule['column']
+        values = np.asarray((profiles.get(dataset_name) or {}).get('values', {}).get(column, []))
+        referenced = np.asarray((profiles.get(rule['dataset']) or {}).get('values', {}).get(rule['key'], []))
+        known = self.known_values(rule['dataset'], rule['key'])
+        if known is not None:
+            referenced = np.union1d(referenced, known)
+
+        missing = values[~np.isin(values, referenced)]
+        ratio = len(missing) / len(values) if len(values) else 0.0
+        observed = {
+            'distinct_values': int(len(values)),
+            'missing_values': int(len(missing)),
+            'missing_sample': [value.item() if isinstance(value, np.generic) else value
+                               for value in missing[:10]],
+            'baseline': known is not None
+        }
+        # Sem chaves de execuções anteriores (lotes incrementais podem não trazer
+        # toda a dimensão), a falha só gera alerta até o histórico existir
+        severity = rule.get('severity', 'error') if known is not None else 'warn'
+        return [self._result(dataset_name, rule, ratio <= rule.get('max_missing_ratio', 0), observed,
+                             column, severity)]
+
+    def evaluate(self, reports, profiles):
+        """Avalia as regras sobre os relatórios e perfis de qualidade (por dataset)"""
+        previous = self.previous_run()
+        results = []
+        for dataset_name, rules in self.expectations.items():
+            report = reports.get(dataset_name)
+            if report is None:
+                continue
+            for rule in rules:
+                if rule['rule'] == 'row_count':
+                    results += self._check_row_count(dataset_name, rule, report, previous)
+                elif rule['rule'] == 'unique':
+                    results += self._check_unique(dataset_name, rule, report)
+                elif rule['rule'] == 'not_null':
+                    results += self._check_not_null(dataset_name, rule, report)
+                elif rule['rule'] == 'range':
+                    results += self._check_range(dataset_name, rule, report)
+                elif rule['rule'] == 'reference':
+                    results += self._check_reference(dataset_name, rule, profiles)
+                else:
+                    raise ValueError(f"Unknown expectation rule: {rule['rule']}")
+
+        failed = [result for result in results if not result['passed']]
+        for result in failed:
+            self.logger.warning(f"Expectation failed ({result['severity']}): {result['dataset']}."
+                                f"{result['rule']} {result['column'] or ''} observed={result['observed']}")
+        self.logger.info(f"Expectations evaluated: {len(results) - len(failed)}/{len(results)} passed")
+        return results
+
+    @staticmethod
+    def errors(results):
+        return [result for result in results if not result['passed'] and result['severity'] == 'error']
+
+    def record(self, results, reports, profiles):
+        """Registra a execução no histórico e, se aprovada, as chaves referenciadas vistas"""
+        if self.store is None:
+            return
+        passed = not self.errors(results)
+        os.makedirs(self.store.base_dir, exist_ok=True)
+        with self._locked():
+            self._record(passed, results, reports, profiles)
+
+    @contextmanager
+    def _locked(self):
+        # Execuções concorrentes do DAG gravam no mesmo histórico e nas mesmas chaves
+        # conhecidas (leitura, união e regravação): uma de cada vez
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.store.base_dir, LOCK_FILE), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _record(self, passed, results, reports, profiles):
+        with open(self._history_path(), 'a') as f:
+            f.write(json.dumps({
+                'run_at': datetime.now().isoformat(),
+                'passed': passed,
+                'datasets': {
+                    dataset_name: {
+                        'rows': report['total_records'],
+                        'null_values': report['null_values'],
+                        'duplicate_records': report['duplicate_records']
+                    }
+                    for dataset_name, report in reports.items()
+                },
+                'failures': [result for result in results if not result['passed']]
+            }, default=str) + '\n')
+
+        if not passed:
+            return
+        for dataset_name in self.expectations:
+            for rule in self.rules(dataset_name, 'reference'):
+                values = (profiles.get(rule['dataset']) or {}).get('values', {}).get(rule['key'])
+                if values is None:
+                    continue
+                known = self.known_values(rule['dataset'], rule['key'])
+                merged = np.union1d(np.asarray(values), known) if known is not None else np.unique(values)
+                # Grava ao lado e substitui: quem avalia expectativas nunca lê um arquivo parcial
+                name = self._known_name(rule['dataset'], rule['key'])
+                temp_name = f"{name}.{os.getpid()}.tmp"
+                self.store.write(pd.DataFrame({rule['key']: merged}), temp_name)
+                os.replace(self.store.path(temp_name), self.store.path(name))
+
+    def enforce(self, results):
+        """Interrompe o pipeline se alguma expectativa com severidade ``error`` falhou"""
+        errors = self.errors(results)
+        if errors:
+            summary = ', '.join(f"{result['dataset']}.{result['rule']}"
+                                f"{'(' + result['column'] + ')' if result['column'] else ''}"
+                                for result in errors)
+            raise ExpectationError(f"{len(errors)} expectations failed: {summary}")
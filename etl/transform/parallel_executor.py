@@ -0,0 +1,95 @@
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import os
+import time
+
+from transform.data_transformer import DataTransformer
+from transform.dtype_planner import DtypePlanner
+
+
+def _transform_partition(dataset_name, partition, part_name, raw_store, processed_store, chunk_size):
+    """Transforma uma partição em um processo do pool
+
+    A partição é lida diretamente do armazenamento e o resultado é gravado em
+    ``part_name``: entre os processos trafegam apenas os nomes dos arquivos, os
+    perfis de qualidade e os agregados parciais (pequenos), nunca os DataFrames
+    dos dados.
+    """
+    transformer = DataTransformer()
+    planner = DtypePlanner()
+    raw_name = transformer.DATASETS[dataset_name][0]
+
+    chunks = raw_store.iter_partition(raw_name, partition, chunk_size)
+    profile, summary = transformer.transform_chunks(dataset_name, chunks, processed_store, planner,
+                                                    clean_name=part_name)
+    return {
+        'dataset': dataset_name,
+        'part_name': part_name,
+        'profile': profile,
+        'summary': summary,
+        'memory_report': planner.memory_report
+    }
+
+
+class ParallelTransformExecutor:
+    """Executa a transformação em um pool de processos
+
+    Os três datasets são independentes e rodam ao mesmo tempo; cada um é
+    dividido em partições (faixas de row groups no Parquet) processadas por
+    workers diferentes. As partes limpas são concatenadas ao final e os
+    agregados parciais das vendas de cada partição são combinados.
+    """
+
+    def __init__(self, transformer, planner, workers=None, chunk_size=100000):
+        self.transformer = transformer
+        self.planner = planner
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.logger = logging.getLogger(__name__)
+
+    def plan_tasks(self, raw_store):
+        """Lista as tarefas (dataset, partição, nome da parte) a executar"""
+        tasks = []
+        for dataset_name, (raw_name, clean_name, _) in self.transformer.DATASETS.items():
+            partitions = raw_store.partitions(raw_name, self.workers)
+            for index, partition in enumerate(partitions):
+                tasks.append((dataset_name, partition, f"{clean_name}.part-{index}"))
+        return tasks
+
+    def run(self, raw_store, processed_store):
+        """Executa as tarefas e consolida os resultados; retorna os perfis de qualidade"""
+        started = time.monotonic()
+        tasks = self.plan_tasks(raw_store)
+        self.logger.info(f"Running {len(tasks)} transform tasks on {self.workers} processes")
+
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks))) as executor:
+            futures = [
+                executor.submit(_transform_partition, dataset_name, partition, part_name,
+                                raw_store, processed_store, self.chunk_size)
+                for dataset_name, partition, part_name in tasks
+            ]
+            results = [future.result() for future in futures]
+
+        profiles = {}
+        summary = None
+        for dataset_name, (_, clean_name, _) in self.transformer.DATASETS.items():
+            dataset_results = [result for result in results if result['dataset'] == dataset_name]
+
+            # Partes na ordem das partições, concatenadas sem carregar os dados
+            processed_store.concat([result['part_name'] for result in dataset_results], clean_name)
+
+            # Perfis das partições combinados (distintos, quantis e duplicatas entre partições)
+            profiles[dataset_name] = self.transformer.profiler.merge(
+                [result['profile'] for result in dataset_results]
+            )
+            if dataset_name == 'sales':
+                partials = [result['summary'] for result in dataset_results if result['summary']]
+                summary = self.transformer.merge_sales_summaries(partials) if partials else None
+
+            for result in dataset_results:
+                self.planner.merge_report(result['memory_report'])
+
+        if 'sales' in self.transformer.DATASETS:
+            self.transformer.write_sales_summary(summary, raw_store, processed_store)
+        self.logger.info(f"Parallel transform completed in {time.monotonic() - started:.2f}s")
+        return profiles